@@ -1,17 +1,38 @@
-from fastapi import FastAPI, Query, HTTPException
+import time
+
+# Cold-start accounting starts before the heavy imports below
+import_started = time.perf_counter()
+
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
-from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
+import logging
 import random
+import asyncio
+import zlib
+from snapshot import ClueSnapshot, SharedSnapshotLoader, SnapshotStore, day_bounds
+from snapshot_file import SnapshotFile
+from upstream import Upstream
+from pagination import InvalidCursor, decode_cursor, next_cursor, order_param, seek_filters, trailing_filters
+from response_cache import ResponseCache, cache_key
+from json_encoding import FastJSONResponse, dumps
+from metrics import STARTUP_SECONDS, MetricsMiddleware, metrics_response
+from seeding import resolve_seed, seed_cache_control, seeded_random
+from invalid_reports import InvalidReportBuffer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
 # Initialize FastAPI app
-app = FastAPI(title="jService API")
+app = FastAPI(title="jService API", default_response_class=FastJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -22,95 +43,412 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Supabase client
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+# Per-route latency, payload and upstream-call metrics, served on /metrics
+app.add_middleware(MetricsMiddleware)
 
-@app.get("/api/random")
-async def get_random_clues(count: Optional[int] = Query(1, le=100)):
-    """Get random clues with their categories."""
+# Initialize the async Supabase (PostgREST) client
+upstream = Upstream.from_env()
+
+# Encoded responses of the deterministic endpoints, with ETags for revalidation
+response_cache = ResponseCache(
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300")),
+    max_age=int(os.getenv("CACHE_CONTROL_MAX_AGE", "300"))
+)
+
+# Optional in-process snapshot of the corpus, refreshed in the background
+snapshot_enabled = os.getenv("SNAPSHOT_ENABLED", "false").lower() in ("1", "true", "yes")
+# The /api/search index is built alongside the snapshot
+search_enabled = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+snapshot_refresh_seconds = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "900"))
+# With several workers, share one mapped copy of the corpus (ideally on tmpfs, e.g. /dev/shm)
+snapshot_shared_path = os.getenv("SNAPSHOT_SHARED_PATH")
+if snapshot_shared_path:
+    snapshot_loader = SharedSnapshotLoader(
+        SnapshotFile(snapshot_shared_path), upstream, max_age=snapshot_refresh_seconds, with_search=search_enabled
+    )
+else:
+    snapshot_loader = lambda: ClueSnapshot.load(upstream, with_search=search_enabled)
+snapshot_store = SnapshotStore(snapshot_loader, refresh_seconds=snapshot_refresh_seconds, on_refresh=response_cache.clear)
+# A prebuilt snapshot file (see snapshot_file.py) served as-is instead of loading from Supabase;
+# mapping it is near-instant, which suits serverless cold starts
+snapshot_file_path = os.getenv("SNAPSHOT_FILE")
+
+# Open the Supabase connection pool and check for data after startup, off the request path
+startup_warmup = os.getenv("STARTUP_WARMUP", "true").lower() in ("1", "true", "yes")
+background_tasks: List[asyncio.Task] = []
+
+async def write_invalid_reports(batch: Dict[int, int]):
+    await upstream.rpc("increment_invalid_counts", {"clue_ids": list(batch), "deltas": list(batch.values())})
+
+# Invalid-clue reports, coalesced per clue and written behind in batches
+invalid_reports = InvalidReportBuffer(
+    write_invalid_reports,
+    max_pending=int(os.getenv("INVALID_REPORTS_MAX_PENDING", "500")),
+    flush_seconds=float(os.getenv("INVALID_REPORTS_FLUSH_SECONDS", "5"))
+)
+
+async def warm_up():
+    """Connect to Supabase ahead of the first request that needs it."""
+    started = time.perf_counter()
     try:
-        # Get random clues with their categories
-        response = supabase.table("clues").select("*, categories(*)").limit(count).execute()
-        clues = response.data
-        
-        # Randomize the results
+        rows = await upstream.select("categories", "id", limit=1)
+        if not rows:
+            logger.warning("No categories found in database. Please run load_data.py to populate the database.")
+        STARTUP_SECONDS.set(time.perf_counter() - started, "warmup")
+    except Exception as e:
+        logger.error(f"Warm-up request to Supabase failed: {str(e)}")
+
+async def build_search_index(snapshot: ClueSnapshot):
+    started = time.perf_counter()
+    await asyncio.to_thread(snapshot.build_search_index)
+    STARTUP_SECONDS.set(time.perf_counter() - started, "search_index")
+
+async def open_snapshot_file():
+    started = time.perf_counter()
+    snapshot = await asyncio.to_thread(ClueSnapshot.from_file, SnapshotFile(snapshot_file_path))
+    if snapshot is None:
+        logger.error(f"Snapshot file {snapshot_file_path} is missing or unreadable, serving from Supabase")
+        return
+    snapshot_store.current = snapshot
+    STARTUP_SECONDS.set(time.perf_counter() - started, "snapshot")
+    logger.info(f"Serving snapshot file {snapshot_file_path} built at {snapshot.loaded_at.isoformat()}")
+    # Unless the file holds one, the search index takes far longer than mapping the file,
+    # so requests don't wait for it
+    if search_enabled and snapshot.search_index is None:
+        background_tasks.append(asyncio.create_task(build_search_index(snapshot)))
+
+@app.on_event("startup")
+async def startup():
+    await invalid_reports.start()
+    if snapshot_file_path:
+        await open_snapshot_file()
+    elif snapshot_enabled:
+        started = time.perf_counter()
+        await snapshot_store.start()
+        STARTUP_SECONDS.set(time.perf_counter() - started, "snapshot")
+    if startup_warmup:
+        background_tasks.append(asyncio.create_task(warm_up()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await snapshot_store.stop()
+    # Drain buffered reports while the upstream client is still open
+    await invalid_reports.stop()
+    await upstream.close()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics for this worker."""
+    return metrics_response()
+
+# Seeded responses only change when the corpus does
+SEED_CACHE_MAX_AGE = int(os.getenv("SEED_CACHE_MAX_AGE", "86400"))
+
+async def sample_clues(count: int, final_only: bool, seed: Optional[str] = None) -> list:
+    """Sample clues with their categories, the same ones every time for a given seed."""
+    rng = seeded_random(seed, "final" if final_only else "random") if seed is not None else None
+    snapshot = snapshot_store.current
+    if snapshot:
+        sample = snapshot.final_clues if final_only else snapshot.random_clues
+        return sample(count, rng)
+
+    # Sample random clues with their categories in the database
+    args = {"sample_size": count, "final_only": final_only}
+    if seed is not None:
+        args["seed"] = seed
+    clues = await upstream.rpc("random_clues", args)
+
+    # Randomize the results; the RPC returns seeded rows in no particular order
+    if rng:
+        clues.sort(key=lambda clue: clue["id"])
+        rng.shuffle(clues)
+    else:
         random.shuffle(clues)
-        return clues[:count]
+    return clues[:count]
+
+async def random_response(request: Request, route: str, count: int, final_only: bool, seed: Optional[str], daily: bool):
+    seed = resolve_seed(seed, daily)
+    try:
+        if seed is None:
+            return FastJSONResponse(await sample_clues(count, final_only))
+        return await response_cache.respond(
+            request,
+            cache_key(route, count=count, seed=seed),
+            lambda: sample_clues(count, final_only, seed),
+            cache_control=seed_cache_control(daily, SEED_CACHE_MAX_AGE)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/random")
+async def get_random_clues(
+    request: Request,
+    count: Optional[int] = Query(1, le=100),
+    seed: Optional[str] = Query(None, min_length=1, max_length=64),
+    daily: bool = False
+):
+    """Get random clues with their categories.
+
+    The same `seed` always returns the same clues; `daily=true` seeds with the
+    UTC date (and overrides `seed`). Seeded responses are cacheable.
+    """
+    return await random_response(request, "random", count, False, seed, daily)
+
 @app.get("/api/final")
-async def get_final_clues(count: Optional[int] = Query(1, le=100)):
-    """Get random final jeopardy clues."""
+async def get_final_clues(
+    request: Request,
+    count: Optional[int] = Query(1, le=100),
+    seed: Optional[str] = Query(None, min_length=1, max_length=64),
+    daily: bool = False
+):
+    """Get random final jeopardy clues, seeded like /api/random."""
+    return await random_response(request, "final", count, True, seed, daily)
+
+@app.get("/api/clues")
+async def get_clues(
+    request: Request,
+    value: Optional[int] = None,
+    min_date: Optional[str] = None,
+    max_date: Optional[str] = None,
+    game_id: Optional[int] = None,
+    category: Optional[int] = None,
+    offset: Optional[int] = 0,
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^(id|airdate)$")
+):
+    """Get clues with optional filters.
+
+    Passing `cursor` (use `start` for the first page) seeks by `sort` instead
+    of using `offset` and returns `{"data": [...], "next_cursor": ...}`.
+    """
+    position = None
+    if cursor is not None:
+        try:
+            position = decode_cursor(cursor, sort)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        offset = 0
+
+    async def produce():
+        snapshot = snapshot_store.current
+        if snapshot:
+            rows = snapshot.filter_rows(value, min_date, max_date, game_id, category, offset, position=position)
+            clues = [snapshot.table.clue_json(row) for row in rows]
+            cursor_rows = [snapshot.table.clue(row) for row in rows]
+        else:
+            clues = cursor_rows = await select_clues(value, min_date, max_date, game_id, category, offset, position)
+
+        if position is None:
+            return clues
+        return {"data": clues, "next_cursor": next_cursor(position[0], cursor_rows, 100)}
+
     try:
-        # Get clues with null value (final jeopardy) and their categories
-        response = supabase.table("clues").select("*, categories(*)").is_("value", "null").limit(count).execute()
-        clues = response.data
-        
-        # Randomize the results
-        random.shuffle(clues)
-        return clues[:count]
+        key = cache_key(
+            "clues", value=value, min_date=min_date, max_date=max_date, game_id=game_id,
+            category=category, offset=offset, cursor=cursor, sort=sort if cursor is not None else None
+        )
+        return await response_cache.respond(request, key, produce)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/clues")
-async def get_clues(
+@app.get("/api/search")
+async def search_clues(
+    request: Request,
+    q: str = Query(..., min_length=1),
     value: Optional[int] = None,
     min_date: Optional[str] = None,
     max_date: Optional[str] = None,
     game_id: Optional[int] = None,
     category: Optional[int] = None,
-    offset: Optional[int] = 0
+    offset: Optional[int] = 0,
+    count: Optional[int] = Query(25, ge=1, le=100)
 ):
-    """Get clues with optional filters."""
+    """Search clue text and category titles, best matches first.
+
+    Every word of `q` must match. Accepts the same filters as /api/clues.
+    """
+    snapshot = snapshot_store.current
+    if not snapshot or snapshot.search_index is None:
+        raise HTTPException(status_code=503, detail="Search index is not available")
+
+    async def produce():
+        return snapshot.search(q, value, min_date, max_date, game_id, category, offset, count)
+
     try:
-        query = supabase.table("clues").select("*, categories(*)")
-        
-        # Apply filters
-        if value is not None:
-            query = query.eq("value", value)
-        if min_date:
-            query = query.gte("airdate", min_date)
-        if max_date:
-            query = query.lte("airdate", max_date)
-        if game_id:
-            query = query.eq("game_id", game_id)
-        if category:
-            query = query.eq("category_id", category)
-            
-        # Add pagination
-        query = query.range(offset, offset + 99)
-        
-        response = query.execute()
-        return response.data
+        key = cache_key(
+            "search", q=" ".join(q.lower().split()), value=value, min_date=min_date, max_date=max_date,
+            game_id=game_id, category=category, offset=offset, count=count
+        )
+        return await response_cache.respond(request, key, produce)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Clues pulled per export query; PostgREST returns at most 1000 rows per request
+EXPORT_CHUNK_SIZE = 1000
+
+@app.get("/api/clues/export")
+async def export_clues(
+    request: Request,
+    value: Optional[int] = None,
+    min_date: Optional[str] = None,
+    max_date: Optional[str] = None,
+    game_id: Optional[int] = None,
+    category: Optional[int] = None
+):
+    """Stream every clue matching the /api/clues filters as NDJSON, in id order.
+
+    The body is gzip-compressed when the client sends `Accept-Encoding: gzip`.
+    """
+    # Once the body starts streaming the status is sent, so bad filters must fail here
+    try:
+        day_bounds(min_date, max_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="min_date and max_date must be ISO dates or timestamps")
+    filters = (value, min_date, max_date, game_id, category)
+    snapshot = snapshot_store.current
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+
+    async def read_chunks():
+        """Yield encoded lines a chunk at a time, fetching the next chunk while one is sent."""
+        position = ("id", None)
+        if snapshot:
+            while True:
+                rows = snapshot.filter_rows(*filters, limit=EXPORT_CHUNK_SIZE, position=position)
+                if not rows:
+                    return
+                yield [snapshot.table.clue_json(row) for row in rows]
+                position = ("id", (snapshot.table.clue_ids[rows[-1]],))
+
+        pending = asyncio.create_task(select_clues(*filters, 0, position, limit=EXPORT_CHUNK_SIZE))
+        try:
+            while True:
+                clues = await pending
+                if len(clues) == EXPORT_CHUNK_SIZE:
+                    position = ("id", (clues[-1]["id"],))
+                    pending = asyncio.create_task(select_clues(*filters, 0, position, limit=EXPORT_CHUNK_SIZE))
+                else:
+                    pending = None
+                if clues:
+                    yield [dumps(clue) for clue in clues]
+                if pending is None:
+                    return
+        finally:
+            # The client went away mid-export
+            if pending is not None:
+                pending.cancel()
+
+    async def body():
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        async for lines in read_chunks():
+            chunk = b"\n".join(lines) + b"\n"
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+        if compressor:
+            yield compressor.flush()
+
+    headers = {"Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=headers)
+
+async def select_clues(value, min_date, max_date, game_id, category, offset, position=None, limit=100):
+    """Query one page of filtered clues from Supabase."""
+    filters = []
+    
+    # Apply filters
+    if value is not None:
+        filters.append(("value", f"eq.{value}"))
+    if min_date:
+        filters.append(("airdate", f"gte.{min_date}"))
+    if max_date:
+        filters.append(("airdate", f"lte.{max_date}"))
+    if game_id:
+        filters.append(("game_id", f"eq.{game_id}"))
+    if category:
+        filters.append(("category_id", f"eq.{category}"))
+    
+    # Add pagination, seeking past the cursor when there is one
+    order, seek, trailing = None, [], None
+    if position:
+        order = order_param(position[0])
+        seek = seek_filters(position)
+        # Date filters rule out the undated clues anyway
+        trailing = None if min_date or max_date else trailing_filters(position)
+    rows = await upstream.select("clues", "*, categories(*)", filters + seek, order=order, limit=limit, offset=offset)
+    if trailing is not None and len(rows) < limit:
+        rows += await upstream.select("clues", "*, categories(*)", filters + trailing, order=order, limit=limit - len(rows))
+    return rows
+
 @app.get("/api/categories")
 async def get_categories(
+    request: Request,
     offset: Optional[int] = 0,
-    count: Optional[int] = Query(1, le=100)
+    count: Optional[int] = Query(1, le=100),
+    cursor: Optional[str] = None
 ):
-    """Get categories with pagination."""
+    """Get categories with pagination.
+
+    Passing `cursor` (use `start` for the first page) seeks by id instead of
+    using `offset` and returns `{"data": [...], "next_cursor": ...}`.
+    """
+    position = None
+    if cursor is not None:
+        try:
+            position = decode_cursor(cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if position[0] != "id":
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+        offset = 0
+
+    async def produce():
+        snapshot = snapshot_store.current
+        if position is None:
+            if snapshot:
+                return [snapshot.table.category_json(row) for row in snapshot.category_rows(offset, count)]
+            return await upstream.select("categories", "*", limit=count, offset=offset)
+
+        after_id = position[1][0] if position[1] else None
+        if snapshot:
+            rows = snapshot.category_rows(0, count, after_id)
+            categories = [snapshot.table.category_json(row) for row in rows]
+            cursor_rows = [snapshot.table.category(row) for row in rows]
+        else:
+            categories = cursor_rows = await upstream.select(
+                "categories", "*", seek_filters(position), order="id.asc", limit=count
+            )
+        return {"data": categories, "next_cursor": next_cursor("id", cursor_rows, count)}
+
     try:
-        response = supabase.table("categories").select("*").range(offset, offset + count - 1).execute()
-        return response.data
+        key = cache_key("categories", offset=offset, count=count, cursor=cursor)
+        return await response_cache.respond(request, key, produce)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/category")
-async def get_single_category(category_id: int):
+async def get_single_category(request: Request, category_id: int):
     """Get a single category with all its clues."""
-    try:
+    async def produce():
+        snapshot = snapshot_store.current
+        if snapshot:
+            category = snapshot.category_with_clues(category_id)
+            if category is None:
+                raise HTTPException(status_code=404, detail="Category not found")
+            return category
+
         # Get category with all its clues
-        response = supabase.table("categories").select("*, clues(*)").eq("id", category_id).execute()
+        rows = await upstream.select("categories", "*, clues(*)", [("id", f"eq.{category_id}")])
         
-        if not response.data:
+        if not rows:
             raise HTTPException(status_code=404, detail="Category not found")
             
-        category = response.data[0]
+        category = rows[0]
         
         # Remove created_at and updated_at from clues
         if "clues" in category:
@@ -119,28 +457,27 @@ async def get_single_category(category_id: int):
                 clue.pop("updated_at", None)
                 
         return category
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/mark_invalid")
-async def mark_clue_invalid(clue_id: int):
-    """Mark a clue as invalid by incrementing its invalid_count."""
     try:
-        # Get current invalid_count
-        response = supabase.table("clues").select("invalid_count").eq("id", clue_id).execute()
-        
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Clue not found")
-            
-        current_count = response.data[0]["invalid_count"] or 0
-        
-        # Update invalid_count
-        response = supabase.table("clues").update({"invalid_count": current_count + 1}).eq("id", clue_id).execute()
-        
-        return response.data[0]
+        return await response_cache.respond(request, cache_key("category", category_id=category_id), produce)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/mark_invalid", status_code=202)
+async def mark_clue_invalid(clue_id: int):
+    """Report a clue as invalid; its invalid_count is incremented with the next batch write."""
+    snapshot = snapshot_store.current
+    if snapshot and not snapshot.has_clue(clue_id):
+        raise HTTPException(status_code=404, detail="Clue not found")
+    
+    pending = invalid_reports.add(clue_id)
+    return {"id": clue_id, "pending_reports": pending}
+
+STARTUP_SECONDS.set(time.perf_counter() - import_started, "import")
+logger.info(f"Imported api in {time.perf_counter() - import_started:.3f}s")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
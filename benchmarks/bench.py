@@ -0,0 +1,103 @@
+"""Benchmark an API end to end against the fake PostgREST server.
+
+Starts benchmarks/fake_postgrest.py and the chosen app (api.py or
+deploy/api.py) with uvicorn, points the app at the fake, waits for both to
+come up, runs the load generator and writes machine-readable results:
+
+    python benchmarks/bench.py --app root --latency-ms 20 --output benchmarks/results/root.json
+    python benchmarks/bench.py --app root --snapshot --output benchmarks/results/root-snapshot.json
+    python benchmarks/compare.py benchmarks/results/before.json benchmarks/results/root.json
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+
+from loadgen import add_load_arguments, run, write_results
+
+BENCHMARKS = Path(__file__).resolve().parent
+ROOT = BENCHMARKS.parent
+APP_DIRS = {"root": ROOT, "deploy": ROOT / "deploy"}
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with {process.returncode} before {url} came up")
+        try:
+            # Any answer means the server is accepting requests (the deploy app answers 403)
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+@contextmanager
+def serve(module: str, cwd: Path, port: int, env: dict, health_path: str, timeout: float = 120):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--port", str(port), "--log-level", "warning"],
+        cwd=cwd,
+        env={**os.environ, **env},
+    )
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}{health_path}", process, timeout)
+        yield
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_load_arguments(parser)
+    parser.add_argument("--data", default=str(ROOT / "json_seasons"), help="directory of season JSON or TSV files")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latency injected into every upstream call")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="random extra upstream latency, up to this much")
+    parser.add_argument("--snapshot", action="store_true", help="serve api.py from its in-memory snapshot")
+    parser.add_argument("--fake-port", type=int, default=54321)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    fake_env = {
+        "FAKE_POSTGREST_DATA": args.data,
+        "FAKE_POSTGREST_LATENCY_MS": str(args.latency_ms),
+        "FAKE_POSTGREST_JITTER_MS": str(args.jitter_ms),
+    }
+    app_env = {
+        "SUPABASE_URL": f"http://127.0.0.1:{args.fake_port}",
+        "SUPABASE_SERVICE_KEY": "benchmark",
+        "SNAPSHOT_ENABLED": "true" if args.snapshot else "false",
+    }
+
+    with serve("fake_postgrest:app", BENCHMARKS, args.fake_port, fake_env, "/health"):
+        with serve("api:app", APP_DIRS[args.app], args.port, app_env, "/metrics"):
+            results = asyncio.run(run(
+                f"http://127.0.0.1:{args.port}",
+                args.app,
+                args.concurrency,
+                args.duration,
+                args.warmup,
+                args.routes,
+                extra_meta={
+                    "data": os.path.relpath(args.data, ROOT),
+                    "upstream_latency_ms": args.latency_ms,
+                    "upstream_jitter_ms": args.jitter_ms,
+                    "snapshot": args.snapshot,
+                },
+            ))
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Measure cold starts: fresh interpreters importing an app and serving one request.
+
+    python benchmarks/cold_start.py --app root --module vercel_app --output benchmarks/results/cold.json
+    python benchmarks/cold_start.py --app root --snapshot-file /dev/shm/jservice.snapshot
+    python benchmarks/compare.py benchmarks/results/cold-before.json benchmarks/results/cold.json --fail-above 10
+
+Each run starts a new Python process that times importing the module,
+running its startup handlers and answering `--path`, the way a serverless
+instance would on its first invocation. The app talks to the fake PostgREST
+server. Phases are reported like loadgen routes (p50/p95/p99 in ms), so
+compare.py can track them.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from bench import APP_DIRS, ROOT, BENCHMARKS, serve
+from loadgen import BYPASS_HEADERS, git_commit, percentile, write_results
+
+# Runs inside each fresh interpreter; prints the phase timings as JSON
+PROBE = """
+import importlib, json, sys, time
+started = time.perf_counter()
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+# The test client pulls in httpx; keep that out of the import figure
+from fastapi.testclient import TestClient
+starting = time.perf_counter()
+with TestClient(module.app, headers=json.loads(sys.argv[3])) as client:
+    ready = time.perf_counter()
+    status = client.get(sys.argv[2]).status_code
+    answered = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "startup": ready - starting,
+    "first_request": answered - ready,
+    "status": status,
+}))
+"""
+
+PHASES = ("process", "import", "startup", "first_request")
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", choices=sorted(APP_DIRS), default="root")
+    parser.add_argument("--module", default="api", help="module exposing `app` (e.g. vercel_app)")
+    parser.add_argument("--path", default="/api/random", help="the first request each instance serves")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--snapshot-file", help="serve api.py from this prebuilt snapshot file")
+    parser.add_argument("--data", default=str(ROOT / "json_seasons"), help="directory of season JSON or TSV files")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latency injected into every upstream call")
+    parser.add_argument("--fake-port", type=int, default=54321)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    fake_env = {
+        "FAKE_POSTGREST_DATA": args.data,
+        "FAKE_POSTGREST_LATENCY_MS": str(args.latency_ms),
+        "FAKE_POSTGREST_JITTER_MS": "0",
+    }
+    app_env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{args.fake_port}",
+        "SUPABASE_SERVICE_KEY": "benchmark",
+        "SNAPSHOT_ENABLED": "false",
+    }
+    if args.snapshot_file:
+        app_env["SNAPSHOT_FILE"] = os.path.abspath(args.snapshot_file)
+    headers = json.dumps(BYPASS_HEADERS if args.app == "deploy" else {})
+
+    samples: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    with serve("fake_postgrest:app", BENCHMARKS, args.fake_port, fake_env, "/health"):
+        for run in range(args.runs):
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-c", PROBE, args.module, args.path, headers],
+                cwd=APP_DIRS[args.app], env=app_env, capture_output=True, text=True, check=True
+            )
+            samples["process"].append(time.perf_counter() - start)
+            timings = json.loads(completed.stdout.strip().splitlines()[-1])
+            if timings["status"] >= 400:
+                raise RuntimeError(f"{args.path} answered {timings['status']}:\n{completed.stderr}")
+            for phase in PHASES[1:]:
+                samples[phase].append(timings[phase])
+            print(
+                f"run {run + 1:>3}: process {samples['process'][-1] * 1000:7.1f} ms  "
+                f"import {timings['import'] * 1000:7.1f} ms  startup {timings['startup'] * 1000:7.1f} ms  "
+                f"first request {timings['first_request'] * 1000:7.1f} ms",
+                file=sys.stderr
+            )
+
+    results = {
+        "meta": {
+            "app": args.app,
+            "module": args.module,
+            "path": args.path,
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "snapshot_file": args.snapshot_file,
+            "upstream_latency_ms": args.latency_ms,
+        },
+        "routes": {phase: summarize(values) for phase, values in samples.items()},
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare two benchmark result files route by route.
+
+    python benchmarks/compare.py before.json after.json [--fail-above 10]
+
+Prints throughput and latency percentiles side by side with the relative
+change. With --fail-above, exits non-zero when any route's p95 got worse by
+more than that many percent, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+from typing import Optional
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(before: float, after: float) -> Optional[float]:
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+
+def format_change(value: Optional[float]) -> str:
+    return "    n/a" if value is None else f"{value:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--fail-above", type=float, help="fail when a route's p95 regresses by more than this percent")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+    print(f"{'route':<16}" + "".join(f"{metric:>30}" for metric in METRICS))
+
+    regressions = []
+    for route in sorted(set(before["routes"]) | set(after["routes"])):
+        old, new = before["routes"].get(route), after["routes"].get(route)
+        if old is None or new is None:
+            print(f"{route:<16} only in {'after' if old is None else 'before'}")
+            continue
+        cells = []
+        for metric in METRICS:
+            # Cold-start results (cold_start.py) have latencies but no throughput
+            if metric not in old or metric not in new:
+                cells.append("n/a")
+                continue
+            cells.append(f"{old[metric]:>10.1f} -> {new[metric]:>10.1f} {format_change(change(old[metric], new[metric]))}")
+        print(f"{route:<16}" + "".join(f"{cell:>30}" for cell in cells))
+
+        p95_change = change(old["p95_ms"], new["p95_ms"])
+        if args.fail_above is not None and p95_change is not None and p95_change > args.fail_above:
+            regressions.append(route)
+
+    if regressions:
+        print(f"p95 regressed by more than {args.fail_above}% on: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
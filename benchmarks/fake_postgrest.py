@@ -0,0 +1,366 @@
+"""Local stand-in for the Supabase PostgREST API, for benchmarks.
+
+Serves the categories and clues tables from `json_seasons/*.json` (or
+`seasons/*.tsv`) with the subset of PostgREST the apps use: `select` with
+`*`/column lists and one level of embedding, eq/neq/gt/gte/lt/lte/in/is
+filters (optionally negated with `not.`), `or=(...)`, embedded filters
+such as `clues.value=not.is.null` or `clues.or=(...)`, `order`, `limit` and `offset`, plus the
+`random_clues`, `increment_invalid_counts` and `set_clean_text` RPCs.
+
+Every response is delayed by FAKE_POSTGREST_LATENCY_MS (plus up to
+FAKE_POSTGREST_JITTER_MS) to stand in for the network hop to Supabase.
+
+    FAKE_POSTGREST_DATA=json_seasons uvicorn benchmarks.fake_postgrest:app --port 54321
+"""
+import asyncio
+import bisect
+import functools
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from clue_cleaning import clean_clue_text  # noqa: E402
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INT_COLUMNS = {"id", "value", "category_id", "game_id", "invalid_count", "clues_count", "valid_clues_count"}
+TIMESTAMP_COLUMNS = {"airdate", "created_at", "updated_at"}
+
+# Embeddable relations: (from table, relation) -> (to table, local key, remote key, one-to-many)
+RELATIONS = {
+    ("clues", "categories"): ("categories", "category_id", "id", False),
+    ("categories", "clues"): ("clues", "id", "category_id", True),
+}
+
+
+# Airdates repeat across thousands of rows, so parsing is memoized
+@functools.lru_cache(maxsize=None)
+def parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class Database:
+    """Both tables in memory, rows in id order, with lookups by id and category."""
+
+    def __init__(self, categories: List[Dict[str, Any]], clues: List[Dict[str, Any]]):
+        self.tables = {
+            "categories": sorted(categories, key=lambda row: row["id"]),
+            "clues": sorted(clues, key=lambda row: row["id"]),
+        }
+        self.ids = {name: [row["id"] for row in rows] for name, rows in self.tables.items()}
+        self.by_id = {name: {row["id"]: row for row in rows} for name, rows in self.tables.items()}
+        self.clues_by_category: Dict[int, List[Dict[str, Any]]] = {}
+        for clue in self.tables["clues"]:
+            self.clues_by_category.setdefault(clue["category_id"], []).append(clue)
+        self.finals = [clue for clue in self.tables["clues"] if clue["value"] is None]
+        # Statistics the real database keeps current with triggers
+        for category in self.tables["categories"]:
+            clues = self.clues_by_category.get(category["id"], [])
+            category["clues_count"] = len(clues)
+            category["valid_clues_count"] = sum(1 for clue in clues if not clue.get("invalid_count"))
+        self._orders: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+
+    def ordered(self, table: str, order: str) -> List[Dict[str, Any]]:
+        """The whole table sorted by `order`, kept like an index would be."""
+        key = (table, order)
+        if key not in self._orders:
+            self._orders[key] = sort_rows(self.tables[table], order)
+        return self._orders[key]
+
+    @classmethod
+    def load(cls, source: Path) -> "Database":
+        """Load every season under `source`, renumbering ids where seasons would collide."""
+        categories: List[Dict[str, Any]] = []
+        clues: List[Dict[str, Any]] = []
+        files = sorted(source.glob("*.json")) or sorted(source.glob("*.tsv"))
+        for path in files:
+            if path.suffix == ".json":
+                with open(path, encoding="utf-8") as f:
+                    season = json.load(f)["categories"]
+            else:
+                from convert_seasons import convert_tsv_to_json
+                season = list(convert_tsv_to_json(path).values())
+
+            # Seasons converted with their own id blocks keep their ids; older files all start at 1
+            category_offset = clue_offset = 0
+            season_clues = [clue for category in season for clue in category.get("clues", [])]
+            if categories and season and min(row["id"] for row in season) <= max(row["id"] for row in categories):
+                category_offset = max(row["id"] for row in categories)
+            if clues and season_clues and min(row["id"] for row in season_clues) <= max(row["id"] for row in clues):
+                clue_offset = max(row["id"] for row in clues)
+            for category in season:
+                category = dict(category)
+                category["id"] += category_offset
+                for clue in category.pop("clues", []):
+                    clue = dict(clue)
+                    clue["id"] += clue_offset
+                    clue["game_id"] = (clue.get("game_id") or 0) + clue_offset
+                    clue["category_id"] = category["id"]
+                    if clue.get("clean_question") is None:
+                        clue["clean_question"], clue["clean_answer"] = clean_clue_text(clue["question"], clue["answer"])
+                    clues.append(clue)
+                categories.append(category)
+            logger.info(f"Loaded {path.name}")
+        logger.info(f"Fake PostgREST serving {len(categories)} categories and {len(clues)} clues")
+        return cls(categories, clues)
+
+
+def split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current).strip())
+    return parts
+
+
+def coerce(column: str, value: str) -> Any:
+    value = value.strip().strip('"')
+    if column in INT_COLUMNS:
+        return int(value)
+    if column in TIMESTAMP_COLUMNS:
+        return parse_timestamp(value)
+    return value
+
+
+def column_value(row: Dict[str, Any], column: str) -> Any:
+    value = row.get(column)
+    if value is not None and column in TIMESTAMP_COLUMNS:
+        return parse_timestamp(value)
+    return value
+
+
+def compile_condition(column: str, expression: str) -> Callable[[Dict[str, Any]], bool]:
+    """Turn `column` and `op.value` into a row predicate."""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, raw = expression.partition(".")
+
+    if op == "is":
+        expected = {"null": None, "true": True, "false": False}[raw]
+        test = lambda row: row.get(column) is expected
+    elif op == "in":
+        members = {coerce(column, item) for item in split_top_level(raw.strip("()"))}
+        test = lambda row: column_value(row, column) in members
+    else:
+        operand = coerce(column, raw)
+        compare = {
+            "eq": lambda a, b: a == b,
+            "neq": lambda a, b: a != b,
+            "gt": lambda a, b: a > b,
+            "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b,
+            "lte": lambda a, b: a <= b,
+        }.get(op)
+        if compare is None:
+            raise HTTPException(status_code=400, detail=f"Unsupported operator: {op}")
+
+        def test(row):
+            value = column_value(row, column)
+            return value is not None and compare(value, operand)
+
+    return (lambda row: not test(row)) if negate else test
+
+
+def compile_logic(kind: str, body: str) -> Callable[[Dict[str, Any]], bool]:
+    """Compile the inside of `or=(...)` / `and(...)`."""
+    conditions = []
+    for part in split_top_level(body):
+        if part.startswith(("and(", "or(")):
+            inner_kind, _, inner = part.partition("(")
+            conditions.append(compile_logic(inner_kind, inner[:-1]))
+        else:
+            column, _, expression = part.partition(".")
+            conditions.append(compile_condition(column, expression))
+    if kind == "or":
+        return lambda row: any(condition(row) for condition in conditions)
+    return lambda row: all(condition(row) for condition in conditions)
+
+
+def parse_select(columns: str) -> Tuple[List[str], Dict[str, List[str]]]:
+    """Split a select list into plain columns and embedded relations."""
+    plain, embeds = [], {}
+    for item in split_top_level(columns):
+        if "(" in item:
+            name, _, inner = item.partition("(")
+            embeds[name.strip()] = [column.strip() for column in inner[:-1].split(",")]
+        else:
+            plain.append(item)
+    return plain, embeds
+
+
+def project(row: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    if "*" in columns:
+        return dict(row)
+    return {column: row.get(column) for column in columns}
+
+
+def sort_rows(rows: List[Dict[str, Any]], order: str) -> List[Dict[str, Any]]:
+    # Apply keys last to first; sorted() is stable
+    for term in reversed(order.split(",")):
+        column, _, direction = term.partition(".")
+        missing = [row for row in rows if row.get(column) is None]
+        present = [row for row in rows if row.get(column) is not None]
+        present.sort(key=lambda row: column_value(row, column), reverse=direction.startswith("desc"))
+        rows = present + missing
+    return rows
+
+
+def candidate_rows(db: Database, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Narrow the scan with the id and category indexes when a filter allows it."""
+    rows = db.tables[table]
+    for column, expression in params:
+        if column == "id" and expression.startswith("gt."):
+            return rows[bisect.bisect_right(db.ids[table], int(expression[3:])):]
+        if column == "id" and expression.startswith(("eq.", "in.")):
+            ids = [int(item) for item in expression[3:].strip("()").split(",") if item]
+            return [db.by_id[table][row_id] for row_id in sorted(set(ids)) if row_id in db.by_id[table]]
+        if table == "clues" and column == "category_id" and expression.startswith("eq."):
+            return db.clues_by_category.get(int(expression[3:]), [])
+    return rows
+
+
+def select(db: Database, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    columns, embeds = parse_select(dict(params).get("select", "*"))
+    order = limit = None
+    offset = 0
+    filters, embed_filters = [], {}
+    for name, value in params:
+        if name == "select":
+            continue
+        elif name == "order":
+            order = value
+        elif name == "limit":
+            limit = int(value)
+        elif name == "offset":
+            offset = int(value)
+        elif name in ("or", "and"):
+            filters.append(compile_logic(name, value.strip()[1:-1]))
+        elif "." in name:
+            relation, _, column = name.partition(".")
+            if column in ("or", "and"):
+                condition = compile_logic(column, value.strip()[1:-1])
+            else:
+                condition = compile_condition(column, value)
+            embed_filters.setdefault(relation, []).append(condition)
+        else:
+            filters.append(compile_condition(name, value))
+
+    # Tables are stored in id order; any other order scans a presorted copy
+    source = db.ordered(table, order) if order and order not in ("id", "id.asc") else candidate_rows(db, table, params)
+    matches = (row for row in source if all(condition(row) for condition in filters))
+    # Rows arrive already in order, so the scan stops at the end of the page
+    rows = list(itertools.islice(matches, offset, None if limit is None else offset + limit))
+
+    result = []
+    for row in rows:
+        shaped = project(row, columns)
+        for relation, relation_columns in embeds.items():
+            target, local_key, remote_key, many = RELATIONS[(table, relation)]
+            conditions = embed_filters.get(relation, [])
+            if many:
+                related = db.clues_by_category.get(row[local_key], [])
+                shaped[relation] = [
+                    project(item, relation_columns) for item in related
+                    if all(condition(item) for condition in conditions)
+                ]
+            else:
+                item = db.by_id[target].get(row[local_key])
+                shaped[relation] = project(item, relation_columns) if item else None
+        result.append(shaped)
+    return result
+
+
+def clue_with_category(db: Database, clue: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(clue, categories=db.by_id["categories"].get(clue["category_id"]))
+
+
+def create_app(db: Optional[Database] = None) -> FastAPI:
+    app = FastAPI(title="Fake PostgREST")
+    latency = float(os.getenv("FAKE_POSTGREST_LATENCY_MS", "0")) / 1000
+    jitter = float(os.getenv("FAKE_POSTGREST_JITTER_MS", "0")) / 1000
+    state = {"db": db}
+
+    def database() -> Database:
+        if state["db"] is None:
+            state["db"] = Database.load(Path(os.getenv("FAKE_POSTGREST_DATA", str(ROOT / "json_seasons"))))
+        return state["db"]
+
+    async def delay():
+        if latency or jitter:
+            await asyncio.sleep(latency + random.uniform(0, jitter))
+
+    @app.on_event("startup")
+    async def startup():
+        database()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/rest/v1/{table}")
+    async def get_rows(table: str, request: Request):
+        if table not in ("categories", "clues"):
+            raise HTTPException(status_code=404, detail=f"Unknown table: {table}")
+        await delay()
+        return JSONResponse(select(database(), table, list(request.query_params.multi_items())))
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def call_function(function: str, request: Request):
+        await delay()
+        db = database()
+        args = await request.json()
+        if function == "random_clues":
+            pool = db.finals if args.get("final_only") else db.tables["clues"]
+            rng = random.Random(args["seed"]) if args.get("seed") is not None else random
+            sample = rng.sample(pool, min(int(args["sample_size"]), len(pool)))
+            return [clue_with_category(db, clue) for clue in sample]
+        if function == "increment_invalid_counts":
+            for clue_id, delta in zip(args["clue_ids"], args["deltas"]):
+                clue = db.by_id["clues"].get(clue_id)
+                if clue is not None:
+                    if not clue["invalid_count"] and delta:
+                        db.by_id["categories"][clue["category_id"]]["valid_clues_count"] -= 1
+                    clue["invalid_count"] = (clue["invalid_count"] or 0) + delta
+            return None
+        if function == "set_clean_text":
+            for clue_id, question, answer in zip(args["clue_ids"], args["questions"], args["answers"]):
+                clue = db.by_id["clues"].get(clue_id)
+                if clue is not None:
+                    clue["clean_question"], clue["clean_answer"] = question, answer
+            return None
+        raise HTTPException(status_code=404, detail=f"Unknown function: {function}")
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,195 @@
+"""Drive every route of a running API at fixed concurrency and record latency.
+
+    python benchmarks/loadgen.py --base-url http://127.0.0.1:8000 --app root --output results.json
+
+Each route is hammered by `--concurrency` workers for `--duration` seconds,
+one route at a time, and reported as requests/s with p50/p95/p99 latency.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# Header the deployed app requires on every request
+BYPASS_HEADERS = {"x-vercel-protection-bypass": "jserviceautobypasssecretcodekeys"}
+
+SEARCH_TERMS = ["river", "president", "shakespeare", "bible", "capital city", "famous", "war", "king"]
+
+# A route is (name, method, build URL from the sampled ids)
+Route = Tuple[str, str, Callable[[Dict[str, List[int]]], str]]
+
+ROOT_ROUTES: List[Route] = [
+    ("random", "GET", lambda ids: "/api/random?count=10"),
+    ("final", "GET", lambda ids: "/api/final?count=5"),
+    ("clues", "GET", lambda ids: f"/api/clues?value={random.choice([200, 400, 600, 800, 1000])}"),
+    ("clues_category", "GET", lambda ids: f"/api/clues?category={random.choice(ids['categories'])}"),
+    ("clues_cursor", "GET", lambda ids: "/api/clues?cursor=start&sort=airdate"),
+    ("categories", "GET", lambda ids: f"/api/categories?count=20&offset={random.randrange(0, 500, 20)}"),
+    ("category", "GET", lambda ids: f"/api/category?category_id={random.choice(ids['categories'])}"),
+    ("search", "GET", lambda ids: f"/api/search?q={random.choice(SEARCH_TERMS)}"),
+    ("export", "GET", lambda ids: f"/api/clues/export?category={random.choice(ids['categories'])}"),
+    ("mark_invalid", "POST", lambda ids: f"/api/mark_invalid?clue_id={random.choice(ids['clues'])}"),
+]
+
+DEPLOY_ROUTES: List[Route] = [
+    ("random", "GET", lambda ids: "/api/random?count=5"),
+    ("final", "GET", lambda ids: "/api/final?count=5"),
+    ("clues", "GET", lambda ids: f"/api/clues?value={random.choice([200, 400, 600, 800, 1000])}"),
+    ("categories", "GET", lambda ids: f"/api/categories?count=20&offset={random.randrange(0, 500, 20)}"),
+    ("category", "GET", lambda ids: "/api/category?id=1"),
+    ("board", "GET", lambda ids: "/api/board?categories=6&clues=5"),
+    ("board_final", "GET", lambda ids: "/api/board?round=final&categories=1"),
+    ("mark_invalid", "POST", lambda ids: f"/api/mark_invalid?clue_id={random.choice(ids['clues'])}"),
+]
+
+APPS = {"root": ROOT_ROUTES, "deploy": DEPLOY_ROUTES}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def sample_ids(client: httpx.AsyncClient) -> Dict[str, List[int]]:
+    """Real category and clue ids to put in request URLs."""
+    categories = (await client.get("/api/categories", params={"count": 100})).json()
+    clues = (await client.get("/api/clues")).json()
+    return {
+        "categories": [row["id"] for row in categories] or [1],
+        "clues": [row["id"] for row in clues] or [1],
+    }
+
+
+async def run_route(
+    client: httpx.AsyncClient,
+    route: Route,
+    ids: Dict[str, List[int]],
+    concurrency: int,
+    duration: float
+) -> Dict[str, Any]:
+    name, method, build_url = route
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, build_url(ids))
+                await response.aread()
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run(
+    base_url: str,
+    app: str,
+    concurrency: int = 16,
+    duration: float = 10.0,
+    warmup: float = 1.0,
+    routes: Optional[List[str]] = None,
+    extra_meta: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    headers = BYPASS_HEADERS if app == "deploy" else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    selected = [route for route in APPS[app] if not routes or route[0] in routes]
+
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        ids = await sample_ids(client)
+        for route in selected:
+            if warmup:
+                await run_route(client, route, ids, concurrency, warmup)
+            results[route[0]] = await run_route(client, route, ids, concurrency, duration)
+            summary = results[route[0]]
+            print(
+                f"{route[0]:<16} {summary['rps']:>9.1f} req/s  p50 {summary['p50_ms']:>8.2f} ms  "
+                f"p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  errors {summary['errors']}",
+                file=sys.stderr
+            )
+
+    return {
+        "meta": {
+            "app": app,
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "concurrency": concurrency,
+            "duration_seconds": duration,
+            **(extra_meta or {}),
+        },
+        "routes": results,
+    }
+
+
+def add_load_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--app", choices=sorted(APPS), default="root", help="which API's routes to drive")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per route")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to drive each route")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds of untimed load before each route")
+    parser.add_argument("--routes", nargs="*", help="only run these routes (by name)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+
+
+def write_results(results: Dict[str, Any], output: Optional[str]):
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    add_load_arguments(parser)
+    args = parser.parse_args()
+    results = asyncio.run(run(args.base_url, args.app, args.concurrency, args.duration, args.warmup, args.routes))
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Fail if any endpoint's query plan falls back to a sequential scan.
+
+Runs EXPLAIN for the SQL that PostgREST generates for each endpoint's
+query against DATABASE_URL, with sequential scans disabled so the planner
+picks an index whenever one applies, however small the table. A Seq Scan
+left in a plan means no index supports that query, and so does an index
+scan that filters rows without any index condition (a full scan of the
+index, typically the primary key walked in id order).
+
+    python check_query_plans.py --seed json_seasons
+
+--seed creates the schema on an empty database (setup.sql plus
+migrations/) and loads the season JSON files first; without it the
+migrations are applied and the existing data is checked.
+"""
+from sqlalchemy import create_engine, text
+from pathlib import Path
+from datetime import datetime, timezone
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+import logging
+from clue_cleaning import clean_clue_text
+from run_migrations import run_migrations
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+ROOT = Path(__file__).resolve().parent
+
+# (endpoint, SQL equivalent of its PostgREST query)
+ENDPOINT_QUERIES = [
+    ("/api/final (random_clues final probe)",
+     "select c.id from clues c where c.value is null and c.id = any(array[10, 20, 30])"),
+    ("/api/final (finals in id order)",
+     "select * from clues where value is null order by id limit 100"),
+    ("/api/clues?value",
+     "select * from clues where value = 400 order by id limit 100"),
+    ("/api/clues?value&cursor",
+     "select * from clues where value = 400 and id > 1000 order by id limit 100"),
+    ("/api/clues?min_date&max_date",
+     "select * from clues where airdate >= '1985-01-01' and airdate <= '1985-03-01' limit 100"),
+    ("/api/clues?sort=airdate&cursor",
+     "select * from clues where airdate >= '1985-01-01'"
+     " and (airdate > '1985-01-01' or (airdate = '1985-01-01' and id > 1000))"
+     " order by airdate, id limit 100"),
+    ("/api/clues?sort=airdate&cursor (undated clues, which sort last)",
+     "select * from clues where airdate is null and id > 1000 order by airdate, id limit 100"),
+    ("/api/clues?game_id",
+     "select * from clues where game_id = 100 order by id limit 100"),
+    ("/api/clues?category",
+     "select * from clues where category_id = 10 order by id limit 100"),
+    ("/api/clues?cursor (id)",
+     "select * from clues where id > 1000 order by id limit 100"),
+    ("/api/category (clues(*) embedding)",
+     "select * from clues where category_id = 10"),
+    ("/api/categories?cursor",
+     "select * from categories where id > 100 order by id limit 20"),
+    ("deploy eligible category ids",
+     "select id from categories where valid_clues_count >= 4 and id > 100 order by id limit 1000"),
+    ("deploy /api/board (valued clues of a batch)",
+     "select * from clues where category_id = any(array[1, 2, 3, 4, 5, 6]) and value is not null"),
+    ("snapshot load (clues page)",
+     "select * from clues where id > 1000 order by id limit 1000"),
+]
+
+TABLES = ("clues", "categories")
+
+def full_scans(plan):
+    """Table scans that read every row, anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    found = []
+    if plan.get("Relation Name") in TABLES:
+        if plan["Node Type"] == "Seq Scan":
+            found.append(f"sequential scan on {plan['Relation Name']}")
+        elif "Index Name" in plan and "Filter" in plan and "Index Cond" not in plan:
+            found.append(f"full scan of {plan['Index Name']} filtering {plan['Filter']}")
+    for child in plan.get("Plans", []):
+        found.extend(full_scans(child))
+    return found
+
+def indexes_used(plan):
+    found = [plan["Index Name"]] if "Index Name" in plan else []
+    for child in plan.get("Plans", []):
+        found.extend(indexes_used(child))
+    return found
+
+def create_schema(connection):
+    """Run setup.sql on an empty database."""
+    # setup.sql grants read access to Supabase's anon role
+    connection.exec_driver_sql(
+        "do $$ begin if not exists (select from pg_roles where rolname = 'anon') then create role anon; end if; end $$"
+    )
+    connection.exec_driver_sql((ROOT / "setup.sql").read_text())
+
+def seed(connection, data_dir):
+    """Load every season file, renumbering ids so seasons don't collide."""
+    category_offset = clue_offset = 0
+    now = datetime.now(timezone.utc).isoformat()
+    for path in sorted(Path(data_dir).glob("*.json")):
+        with open(path, encoding="utf-8") as f:
+            categories = json.load(f)["categories"]
+
+        category_rows, clue_rows = [], []
+        for category in categories:
+            category_rows.append({
+                "id": category["id"] + category_offset,
+                "title": category["title"],
+                "created_at": category.get("created_at") or now
+            })
+            for clue in category["clues"]:
+                clean_question, clean_answer = clean_clue_text(clue["question"], clue["answer"])
+                clue_rows.append({
+                    "id": clue["id"] + clue_offset,
+                    "answer": clue["answer"],
+                    "question": clue["question"],
+                    "clean_question": clean_question,
+                    "clean_answer": clean_answer,
+                    "value": clue["value"],
+                    "airdate": clue["airdate"],
+                    "category_id": category["id"] + category_offset,
+                    "game_id": (clue.get("game_id") or 0) + clue_offset,
+                    "created_at": clue.get("created_at") or now
+                })
+
+        connection.execute(text(
+            "insert into categories (id, title, created_at, updated_at) overriding system value"
+            " values (:id, :title, :created_at, :created_at)"
+        ), category_rows)
+        connection.execute(text(
+            "insert into clues (id, answer, question, clean_question, clean_answer, value, airdate,"
+            " category_id, game_id, created_at, updated_at) overriding system value"
+            " values (:id, :answer, :question, :clean_question, :clean_answer, :value, :airdate,"
+            " :category_id, :game_id, :created_at, :created_at)"
+        ), clue_rows)
+
+        category_offset = max(row["id"] for row in category_rows) if category_rows else category_offset
+        clue_offset = max(row["id"] for row in clue_rows) if clue_rows else clue_offset
+        logger.info(f"Seeded {path.name}: {len(category_rows)} categories, {len(clue_rows)} clues")
+
+def check_plans(connection):
+    """EXPLAIN every endpoint query; return the endpoints that scan a whole table."""
+    connection.exec_driver_sql("set enable_seqscan = off")
+    failures = []
+    for endpoint, query in ENDPOINT_QUERIES:
+        plan = connection.exec_driver_sql(f"explain (format json) {query}").scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+        scans = full_scans(root)
+        if scans:
+            failures.append(endpoint)
+            logger.error(f"FAIL {endpoint}: {'; '.join(scans)}")
+        else:
+            logger.info(f"ok   {endpoint}: {', '.join(indexes_used(root)) or 'no table access'}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--seed", metavar="DIR", help="create the schema and load season JSON files from DIR")
+    args = parser.parse_args()
+    if not args.database_url:
+        raise ValueError("DATABASE_URL environment variable is not set")
+
+    engine = create_engine(args.database_url)
+    if args.seed:
+        with engine.begin() as connection:
+            if connection.exec_driver_sql("select to_regclass('clues')").scalar() is None:
+                create_schema(connection)
+            if connection.exec_driver_sql("select count(*) from clues").scalar() == 0:
+                seed(connection, args.seed)
+    run_migrations(engine)
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("analyze categories")
+        connection.exec_driver_sql("analyze clues")
+        failures = check_plans(connection)
+
+    if failures:
+        logger.error(f"{len(failures)} of {len(ENDPOINT_QUERIES)} endpoint queries fall back to a full table scan")
+        sys.exit(1)
+    logger.info(f"All {len(ENDPOINT_QUERIES)} endpoint queries use an index")
+
+if __name__ == "__main__":
+    main()
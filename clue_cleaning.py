@@ -0,0 +1,42 @@
+import html
+import re
+from typing import Tuple
+
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def clean_clue_text(question: str, answer: str) -> Tuple[str, str]:
+    """Strip markup from a clue's text the way the game displays it.
+
+    Ingestion stores the result in clean_question/clean_answer so the API can
+    serve it as-is. Rerun reclean_clues.py after changing these rules.
+    """
+    question = (question or "").strip()
+    answer = (answer or "").strip()
+    
+    # Remove HTML tags
+    question = TAG_PATTERN.sub('', question)
+    answer = TAG_PATTERN.sub('', answer)
+    
+    # Unescape HTML entities
+    question = html.unescape(question)
+    answer = html.unescape(answer)
+    
+    # Remove quotes and italics markers
+    answer = answer.replace('"', '').replace("'", "").replace("<i>", "").replace("</i>", "")
+    
+    # If question is empty but answer isn't, swap them
+    if not question and answer:
+        question = answer
+        # Try to extract a reasonable answer from the question
+        answer_parts = question.split(',')
+        if len(answer_parts) > 1:
+            answer = answer_parts[-1].strip()
+        else:
+            words = question.split()
+            if len(words) > 3:
+                answer = ' '.join(words[-3:]).strip()
+            else:
+                answer = question
+    
+    return question, answer
@@ -0,0 +1,419 @@
+import bisect
+import functools
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from clue_cleaning import clean_clue_text
+from json_encoding import RawJSON, dumps
+
+# Sentinels for NULL in integer and day columns
+NULL = -(2 ** 63)
+NULL_DAY = -(2 ** 31)
+
+# Where clues without an airdate go in airdate order: after every real day, as Postgres sorts nulls
+NULLS_LAST_DAY = 2 ** 31 - 1
+
+# Heap references of text columns: NULL_REF is NULL, DERIVED is cleaned text
+# that clean_clue_text gives back from the row's raw question and answer,
+# so it is recomputed on read instead of stored twice
+NULL_REF = -1
+DERIVED = -2
+
+CLEAN_COLUMNS = ("clean_question", "clean_answer")
+
+# Column kinds
+INT = "int"      # nullable 64-bit integer
+DAY = "day"      # timestamp stored as whole days since the Unix epoch
+TEXT = "text"    # free text, one heap entry per row
+LABEL = "label"  # repetitive text (titles, ingestion timestamps), interned in the heap
+
+# Columns in the order PostgREST returns them
+CLUE_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("id", INT),
+    ("answer", TEXT),
+    ("question", TEXT),
+    ("value", INT),
+    ("airdate", DAY),
+    ("created_at", LABEL),
+    ("updated_at", LABEL),
+    ("category_id", INT),
+    ("game_id", INT),
+    ("invalid_count", INT),
+    ("clean_question", TEXT),
+    ("clean_answer", TEXT),
+)
+
+CATEGORY_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("id", INT),
+    ("title", LABEL),
+    ("created_at", LABEL),
+    ("updated_at", LABEL),
+    ("clues_count", INT),
+    ("valid_clues_count", INT),
+)
+
+EPOCH = date(1970, 1, 1)
+
+# Budget for encoded clue fragments kept per table
+FRAGMENT_CACHE_BYTES = 32 * 1024 * 1024
+
+
+# Only a few thousand distinct airdates exist, so loads mostly hit the cache
+@functools.lru_cache(maxsize=65536)
+def to_epoch_day(value: str) -> int:
+    """Convert an ISO timestamp to days since the epoch (UTC)."""
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return (parsed.date() - EPOCH).days
+
+
+# A row's two clean columns are read one after the other from the same raw text
+cached_clean_text = functools.lru_cache(maxsize=1024)(clean_clue_text)
+
+
+def from_epoch_day(day: int) -> str:
+    """Format an epoch day the way PostgREST renders a midnight timestamptz."""
+    return f"{(EPOCH + timedelta(days=day)).isoformat()}T00:00:00+00:00"
+
+
+class StringHeap:
+    """Packed UTF-8 storage for every string in a table.
+
+    String `i` is `data[offsets[i]:offsets[i + 1]]`. Labels are interned so
+    each distinct title or timestamp is stored once.
+    """
+
+    def __init__(self, data=None, offsets=None):
+        self.data = bytearray() if data is None else data
+        self.offsets = array("q", [0]) if offsets is None else offsets
+        self._interned: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NULL_REF
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+        return len(self.offsets) - 2
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return NULL_REF
+        index = self._interned.get(value)
+        if index is None:
+            index = self._interned[value] = self.add(value)
+        return index
+
+    def get(self, index: int) -> Optional[str]:
+        if index < 0:
+            return None
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def nbytes(self) -> int:
+        return len(self.data) + len(self.offsets) * self.offsets.itemsize
+
+
+class ColumnTable:
+    """Rows stored column by column, all strings living in a shared heap."""
+
+    def __init__(self, schema: Sequence[Tuple[str, str]], heap: StringHeap, columns: Optional[Dict[str, Any]] = None):
+        self.schema = tuple(schema)
+        self.heap = heap
+        self.columns = columns if columns is not None else {
+            name: array("q") if kind == INT else array("i") for name, kind in self.schema
+        }
+
+    def __len__(self) -> int:
+        return len(self.columns[self.schema[0][0]])
+
+    def append(self, row: Dict[str, Any]):
+        heap = self.heap
+        derived = None
+        for name, kind in self.schema:
+            value = row.get(name)
+            if kind == INT:
+                self.columns[name].append(NULL if value is None else value)
+            elif kind == DAY:
+                self.columns[name].append(NULL_DAY if value is None else to_epoch_day(value))
+            elif kind == LABEL:
+                self.columns[name].append(heap.intern(value))
+            elif name in CLEAN_COLUMNS and value is not None:
+                if derived is None:
+                    derived = dict(zip(CLEAN_COLUMNS, clean_clue_text(row.get("question"), row.get("answer"))))
+                self.columns[name].append(DERIVED if derived[name] == value else heap.add(value))
+            else:
+                self.columns[name].append(heap.add(value))
+
+    def value(self, row: int, name: str, kind: str) -> Any:
+        raw = self.columns[name][row]
+        if kind == INT:
+            return None if raw == NULL else raw
+        if kind == DAY:
+            return None if raw == NULL_DAY else from_epoch_day(raw)
+        if raw == DERIVED:
+            return self.derived_text(row, name)
+        return self.heap.get(raw)
+
+    def derived_text(self, row: int, name: str) -> str:
+        question, answer = (self.heap.get(self.columns[column][row]) for column in ("question", "answer"))
+        return cached_clean_text(question, answer)[CLEAN_COLUMNS.index(name)]
+
+    def row_dict(self, row: int, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+        return {name: self.value(row, name, kind) for name, kind in self.schema if name not in exclude}
+
+    def nbytes(self) -> int:
+        return sum(len(column) * column.itemsize for column in self.columns.values())
+
+
+class FragmentCache:
+    """LRU of encoded rows, bounded by their total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[int, RawJSON]" = OrderedDict()
+
+    def get(self, row: int) -> Optional[RawJSON]:
+        fragment = self._entries.get(row)
+        if fragment is not None:
+            self._entries.move_to_end(row)
+        return fragment
+
+    def put(self, row: int, fragment: RawJSON):
+        self._entries[row] = fragment
+        self.size += len(fragment)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class RowView:
+    """Lazy view of one row; nothing is decoded until a field is read."""
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: ColumnTable, row: int):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, name: str) -> Any:
+        for column, kind in self.table.schema:
+            if column == name:
+                return self.table.value(self.row, name, kind)
+        raise KeyError(name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.table.row_dict(self.row)
+
+
+class ClueTable:
+    """Compact, read-only copy of the clue corpus.
+
+    Clues are stored in id order. Integer columns are flat arrays, airdates
+    are epoch days, and all text shares one packed heap with titles and
+    timestamps interned and clean text derived from the raw text where the
+    cleaning rules reproduce it, so a full corpus takes tens of MB instead of the
+    hundreds a list of dicts would. The columns may be arrays or memoryviews
+    over a mapped snapshot file (see snapshot_file.py).
+    """
+
+    def __init__(
+        self,
+        heap: StringHeap,
+        categories: ColumnTable,
+        clues: ColumnTable,
+        category_order: Optional[Sequence[int]] = None,
+        category_offsets: Optional[Sequence[int]] = None,
+        finals: Optional[Sequence[int]] = None
+    ):
+        self.heap = heap
+        self.categories = categories
+        self.clues = clues
+        self.clue_ids = clues.columns["id"]
+        self.category_ids = categories.columns["id"]
+        # Encoded JSON of rows already served; the table never changes, so they never go stale
+        self.category_fragments: Dict[int, RawJSON] = {}
+        self.clue_fragments = FragmentCache(FRAGMENT_CACHE_BYTES)
+        self.index(category_order, category_offsets, finals)
+
+    def index(
+        self,
+        category_order: Optional[Sequence[int]] = None,
+        category_offsets: Optional[Sequence[int]] = None,
+        finals: Optional[Sequence[int]] = None
+    ):
+        """Build the lookup arrays derived from the columns, unless they were stored with them.
+
+        `category_order` holds clue rows grouped by category and
+        `category_offsets` indexes it by category row: the clues of category
+        row `r` are `category_order[category_offsets[r]:category_offsets[r + 1]]`.
+        """
+        category_column = self.clues.columns["category_id"]
+        if category_order is None:
+            # Clues without a category row (the foreign key rules them out) are left out;
+            # id order within each group since sorted() is stable
+            known = set(self.category_ids)
+            category_order = array("i", sorted(
+                (row for row in range(len(self.clues)) if category_column[row] in known),
+                key=category_column.__getitem__
+            ))
+        self.category_order = category_order
+        if category_offsets is None:
+            category_offsets = array("q", [0])
+            position, end = 0, len(category_order)
+            for category_id in self.category_ids:
+                while position < end and category_column[category_order[position]] == category_id:
+                    position += 1
+                category_offsets.append(position)
+        self.category_offsets = category_offsets
+        if finals is None:
+            values = self.clues.columns["value"]
+            finals = array("i", (row for row in range(len(self.clues)) if values[row] == NULL))
+        self.finals = finals
+
+    def nbytes(self) -> int:
+        return (
+            self.heap.nbytes() + self.categories.nbytes() + self.clues.nbytes()
+            + len(self.category_order) * self.category_order.itemsize
+            + len(self.category_offsets) * self.category_offsets.itemsize
+            + len(self.finals) * self.finals.itemsize
+        )
+
+    def __len__(self) -> int:
+        return len(self.clues)
+
+    def clue(self, row: int) -> RowView:
+        return RowView(self.clues, row)
+
+    def category(self, row: int) -> RowView:
+        return RowView(self.categories, row)
+
+    def find_clue(self, clue_id: int) -> Optional[int]:
+        row = bisect.bisect_left(self.clue_ids, clue_id)
+        if row < len(self.clue_ids) and self.clue_ids[row] == clue_id:
+            return row
+        return None
+
+    def find_category(self, category_id: int) -> Optional[int]:
+        row = bisect.bisect_left(self.category_ids, category_id)
+        if row < len(self.category_ids) and self.category_ids[row] == category_id:
+            return row
+        return None
+
+    def clue_rows_for_category(self, category_id: int) -> Sequence[int]:
+        category_row = self.find_category(category_id)
+        if category_row is None:
+            return self.category_order[0:0]
+        return self.category_order[self.category_offsets[category_row]:self.category_offsets[category_row + 1]]
+
+    def clue_with_category(self, row: int) -> Dict[str, Any]:
+        """Serialize a clue like PostgREST's `*, categories(*)` embedding."""
+        clue = self.clues.row_dict(row)
+        category_row = self.find_category(clue["category_id"])
+        clue["categories"] = None if category_row is None else self.categories.row_dict(category_row)
+        return clue
+
+    def category_json(self, category_row: int) -> RawJSON:
+        fragment = self.category_fragments.get(category_row)
+        if fragment is None:
+            fragment = self.category_fragments[category_row] = RawJSON(dumps(self.categories.row_dict(category_row)))
+        return fragment
+
+    def clue_json(self, row: int) -> RawJSON:
+        """Encoded `clue_with_category(row)`, spliced from cached clue and category fragments."""
+        fragment = self.clue_fragments.get(row)
+        if fragment is None:
+            category_row = self.find_category(self.clues.columns["category_id"][row])
+            category = b"null" if category_row is None else self.category_json(category_row)
+            # Reopen the encoded clue object to append the embedded category
+            fragment = RawJSON(dumps(self.clues.row_dict(row))[:-1] + b',"categories":' + category + b"}")
+            self.clue_fragments.put(row, fragment)
+        return fragment
+
+    def category_with_clues(self, category_row: int) -> Dict[str, Any]:
+        """Serialize a category like `*, clues(*)` with clue timestamps removed."""
+        category = self.categories.row_dict(category_row)
+        category["clues"] = [
+            self.clues.row_dict(row, exclude=("created_at", "updated_at"))
+            for row in self.clue_rows_for_category(category["id"])
+        ]
+        return category
+
+
+class ClueTableBuilder:
+    """Accumulates rows page by page so the full list of dicts never exists at once."""
+
+    def __init__(self):
+        self.heap = StringHeap()
+        self.categories = ColumnTable(CATEGORY_COLUMNS, self.heap)
+        self.clues = ColumnTable(CLUE_COLUMNS, self.heap)
+
+    def add_categories(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.categories.append(row)
+
+    def add_clues(self, rows: Iterable[Dict[str, Any]]):
+        for row in rows:
+            self.clues.append(row)
+
+    def build(self) -> ClueTable:
+        sort_by_id(self.categories)
+        sort_by_id(self.clues)
+        return ClueTable(self.heap, self.categories, self.clues)
+
+
+def sort_by_id(table: ColumnTable):
+    """Reorder every column so rows are in id order (a no-op when already sorted)."""
+    ids = table.columns["id"]
+    if all(ids[i] < ids[i + 1] for i in range(len(ids) - 1)):
+        return
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    for name, column in table.columns.items():
+        table.columns[name] = array(column.typecode, (column[i] for i in order))
+
+
+def build_clue_table(categories: List[Dict[str, Any]], clues: List[Dict[str, Any]]) -> ClueTable:
+    builder = ClueTableBuilder()
+    builder.add_categories(categories)
+    builder.add_clues(clues)
+    return builder.build()
+
+
+def with_clean_text(clue: Dict[str, Any]) -> Dict[str, Any]:
+    if "clean_question" not in clue or "clean_answer" not in clue:
+        clue["clean_question"], clue["clean_answer"] = clean_clue_text(clue["question"], clue["answer"])
+    return clue
+
+
+def table_from_categories(categories: Iterable[Dict[str, Any]]) -> ClueTable:
+    """Build a table from categories with nested `clues`, the shape of the season JSON files.
+
+    clues_count and valid_clues_count are recounted from the nested clues,
+    as the database triggers would. Clues without clean text (legacy JSON,
+    the SQLite export) get it computed, as load_data.py does.
+    """
+    builder = ClueTableBuilder()
+    for category in categories:
+        clues = category.get("clues") or []
+        builder.add_clues(with_clean_text(dict(clue, category_id=category["id"])) for clue in clues)
+        builder.categories.append(dict(
+            category,
+            clues_count=len(clues),
+            valid_clues_count=sum(1 for clue in clues if not clue.get("invalid_count"))
+        ))
+    return builder.build()
+
+
+def airdate_sort_day(day: int) -> int:
+    return NULLS_LAST_DAY if day == NULL_DAY else day
+
+
+def airdate_order(table: ClueTable) -> array:
+    """Clue rows sorted by (airdate, id), clues without an airdate last."""
+    airdays, ids = table.clues.columns["airdate"], table.clue_ids
+    return array("i", sorted(range(len(table)), key=lambda row: (airdate_sort_day(airdays[row]), ids[row])))
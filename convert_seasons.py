@@ -1,101 +1,122 @@
 import os
+import re
+import argparse
 import json
-import csv
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
 import logging
 from pathlib import Path
+from tsv_ingest import CategoryTreeSink, ClueTableSink, IngestResult, RecordingSink, ingest_tsv
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def convert_tsv_to_json(tsv_file):
+# Every season owns a block of this many category ids and as many clue ids, picked by
+# its file number, so seasons never collide and can be converted in any order or in parallel
+SEASON_ID_STRIDE = 100_000
+
+def season_first_id(tsv_file):
+    """First id of a season's block: 1 for season1.tsv, 100001 for season2.tsv, ..."""
+    match = re.fullmatch(r"season(\d+)", Path(tsv_file).stem)
+    if match is None or int(match.group(1)) < 1:
+        raise ValueError(f"Can't tell which season {Path(tsv_file).name} is, expected season<N>.tsv")
+    return (int(match.group(1)) - 1) * SEASON_ID_STRIDE + 1
+
+def ingest_season(tsv_file, sinks) -> IngestResult:
+    first_id = season_first_id(tsv_file)
+    result = ingest_tsv(tsv_file, sinks, first_category_id=first_id, first_clue_id=first_id)
+    if max(result.categories, result.clues) > SEASON_ID_STRIDE:
+        raise ValueError(f"{Path(tsv_file).name} needs more than the {SEASON_ID_STRIDE} ids a season gets")
+    return result
+
+def convert_tsv_to_json(tsv_file, created_at=None):
     """Convert a single TSV file to our required JSON format."""
-    categories = {}
-    category_counter = 1
-    clue_counter = 1
-    current_date = datetime.now(timezone.utc)
-    
-    # First pass: Create categories
-    with open(tsv_file, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file, delimiter='\t')
-        for row in reader:
-            category_title = row['category'].strip()
-            if category_title not in categories:
-                category = {
-                    "id": category_counter,
-                    "title": category_title,
-                    "created_at": current_date.isoformat(),
-                    "updated_at": current_date.isoformat(),
-                    "clues_count": 0,
-                    "clues": []
-                }
-                categories[category_title] = category
-                category_counter += 1
-    
-    # Second pass: Create clues and update category counts
-    category_clue_counts = {}
-    with open(tsv_file, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file, delimiter='\t')
-        for row in reader:
-            category_title = row['category'].strip()
-            category = categories[category_title]
-            
-            # Create clue
-            clue = {
-                "id": clue_counter,
-                "answer": row['answer'].strip(),
-                "question": row['comments'].strip(),
-                "value": int(row['clue_value']) if row['clue_value'].isdigit() else 200,
-                "airdate": datetime.strptime(row['air_date'] + "T00:00:00.000Z", "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc).isoformat(),
-                "created_at": current_date.isoformat(),
-                "updated_at": current_date.isoformat(),
-                "category_id": category["id"],
-                "game_id": clue_counter,
-                "invalid_count": None
-            }
-            category["clues"].append(clue)
-            
-            # Update category clue count
-            if category["id"] not in category_clue_counts:
-                category_clue_counts[category["id"]] = 0
-            category_clue_counts[category["id"]] += 1
-            
-            clue_counter += 1
-    
-    # Update category clue counts and filter out categories with less than 5 clues
-    filtered_categories = {}
-    for category_title, category in categories.items():
-        count = category_clue_counts.get(category["id"], 0)
-        if count >= 5:
-            category["clues_count"] = count
-            filtered_categories[category["id"]] = category
-    
-    return filtered_categories
+    sink = CategoryTreeSink(created_at or datetime.now(timezone.utc).isoformat())
+    ingest_season(tsv_file, [sink])
+    return sink.categories
+
+def convert_season_file(tsv_file, output_dir, created_at):
+    """Convert one season and write its JSON file; runs in a worker process."""
+    categories = convert_tsv_to_json(tsv_file, created_at)
+    output_file = Path(output_dir) / f"{Path(tsv_file).stem}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"categories": list(categories.values())}, f, indent=2)
+    return output_file
+
+def record_season(tsv_file):
+    """Parse one season into records the parent process replays; runs in a worker process."""
+    sink = RecordingSink()
+    ingest_season(tsv_file, [sink])
+    return sink
+
+def map_seasons(function, tsv_files, jobs, *args):
+    """Run `function(tsv_file, *args)` for every season on `jobs` processes.
+
+    Yields (tsv_file, future) in file order. Only a couple of results per
+    worker are queued ahead of the consumer, so memory stays bounded
+    however many seasons there are.
+    """
+    # A single job runs in this process, which keeps tracebacks and profiling simple
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else ThreadPoolExecutor(max_workers=1)
+    with executor:
+        pending = deque()
+        for tsv_file in tsv_files:
+            pending.append((tsv_file, executor.submit(function, tsv_file, *args)))
+            if len(pending) > 2 * jobs:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+def write_snapshot(tsv_files, output, jobs=1, created_at=None):
+    """Convert every season into one snapshot file."""
+    # snapshot_file needs fcntl (Unix only); keep the JSON export portable
+    from snapshot_file import SnapshotFile
+
+    sink = ClueTableSink(created_at or datetime.now(timezone.utc).isoformat())
+    for tsv_file, future in map_seasons(record_season, tsv_files, jobs):
+        future.result().replay([sink])
+        logger.info(f"Added {tsv_file.name} to the snapshot")
+    SnapshotFile(output).write(sink.build())
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert seasons/*.tsv into season JSON files or one snapshot file.")
+    parser.add_argument(
+        "--format", choices=("json", "snapshot"), default="json",
+        help="json: one json_seasons/<season>.json per season; snapshot: one memory-mappable file for SNAPSHOT_FILE"
+    )
+    parser.add_argument("--output", help="output directory for json (default json_seasons), file for snapshot (default jservice.snapshot)")
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count() or 1,
+        help="seasons converted in parallel (default: one per CPU); ids don't depend on it"
+    )
+    args = parser.parse_args()
+
+    seasons_dir = Path("seasons")
+    tsv_files = sorted(seasons_dir.glob("season*.tsv"), key=season_first_id)
+    first_ids = [season_first_id(tsv_file) for tsv_file in tsv_files]
+    if len(set(first_ids)) != len(first_ids):
+        raise ValueError("Two season files have the same season number, their ids would collide")
+    # One timestamp for the whole run, whichever process converts a season
+    created_at = datetime.now(timezone.utc).isoformat()
+
+    if args.format == "snapshot":
+        write_snapshot(tsv_files, args.output or "jservice.snapshot", args.jobs, created_at)
+        return
+
     # Create output directory if it doesn't exist
-    output_dir = Path("json_seasons")
+    output_dir = Path(args.output or "json_seasons")
     output_dir.mkdir(exist_ok=True)
-    
+
     # Process each season file
-    seasons_dir = Path("seasons")
-    for tsv_file in seasons_dir.glob("season*.tsv"):
-        logger.info(f"Processing {tsv_file.name}...")
+    for tsv_file, future in map_seasons(convert_season_file, tsv_files, args.jobs, output_dir, created_at):
         try:
-            # Convert TSV to JSON
-            categories = convert_tsv_to_json(tsv_file)
-            
-            # Save to JSON file
-            output_file = output_dir / f"{tsv_file.stem}.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump({"categories": list(categories.values())}, f, indent=2)
-            
+            output_file = future.result()
             logger.info(f"Successfully converted {tsv_file.name} to {output_file.name}")
-            
         except Exception as e:
             logger.error(f"Error processing {tsv_file.name}: {str(e)}")
             continue
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
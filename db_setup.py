@@ -1,11 +1,11 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, insert, update, Column, Integer, String, DateTime, ForeignKey, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import os
-import csv
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 import logging
+from tsv_ingest import TsvSink, ingest_tsv
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,7 +23,9 @@ class Category(Base):
     title = Column(String(255), nullable=False)
     created_at = Column(DateTime(timezone=True), nullable=False)
     updated_at = Column(DateTime(timezone=True), nullable=False)
+    # Set by DatabaseSink once loaded, then maintained by triggers on clues (migrations/004_category_stats.sql)
     clues_count = Column(Integer, nullable=False, default=0)
+    valid_clues_count = Column(Integer, nullable=False, default=0)
     clues = relationship("Clue", back_populates="category")
 
 class Clue(Base):
@@ -32,6 +34,8 @@ class Clue(Base):
     id = Column(Integer, primary_key=True)
     answer = Column(Text, nullable=False)
     question = Column(Text, nullable=False)
+    clean_question = Column(Text)
+    clean_answer = Column(Text)
     value = Column(Integer)
     airdate = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), nullable=False)
@@ -42,6 +46,83 @@ class Clue(Base):
     
     category = relationship("Category", back_populates="clues")
 
+# Rows written per INSERT (and per commit)
+BATCH_SIZE = 1000
+
+class DatabaseSink(TsvSink):
+    """Writes categories and clues in batched multi-row inserts as the TSV is read.
+
+    Categories go in before their clues, so their counts are filled in at
+    the end. On Postgres with migration 004 the triggers keep the counts
+    and ignore that update; SQLite has no triggers and relies on it.
+    """
+
+    def __init__(self, session, current_date):
+        self.session = session
+        self.current_date = current_date
+        self.category_ids = []
+        self.clue_counts = {}
+        self.categories = []
+        self.clues = []
+        self.imported = 0
+
+    def category(self, category_id, title):
+        self.category_ids.append(category_id)
+        self.clue_counts[category_id] = 0
+        self.categories.append({
+            "id": category_id,
+            "title": title,
+            "created_at": self.current_date,
+            "updated_at": self.current_date
+        })
+
+    def clue(self, clue):
+        self.clues.append({
+            "id": clue.id,
+            "answer": clue.answer,
+            "question": clue.question,
+            "clean_question": clue.clean_question,
+            "clean_answer": clue.clean_answer,
+            "value": clue.value,
+            "airdate": clue.airdate,
+            "created_at": self.current_date,
+            "updated_at": self.current_date,
+            "category_id": clue.category_id,
+            "game_id": clue.game_id,
+            "invalid_count": None
+        })
+        self.clue_counts[clue.category_id] += 1
+        if len(self.clues) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        # A category is always seen before its clues, so inserting categories first keeps the foreign key happy
+        if self.categories:
+            self.session.execute(insert(Category), self.categories)
+        if self.clues:
+            self.session.execute(insert(Clue), self.clues)
+        self.session.commit()
+        self.imported += len(self.clues)
+        self.categories, self.clues = [], []
+        logger.info(f"Imported {self.imported} clues")
+
+    def finish(self, kept):
+        self.flush()
+        # Remove categories with less than 5 clues, their clues first
+        dropped = [category_id for category_id in self.category_ids if category_id not in kept]
+        for start in range(0, len(dropped), BATCH_SIZE):
+            batch = dropped[start:start + BATCH_SIZE]
+            self.session.query(Clue).filter(Clue.category_id.in_(batch)).delete(synchronize_session=False)
+            self.session.query(Category).filter(Category.id.in_(batch)).delete(synchronize_session=False)
+        # Every clue starts out unreported, so all of them are valid
+        counts = [
+            {"id": category_id, "clues_count": self.clue_counts[category_id], "valid_clues_count": self.clue_counts[category_id]}
+            for category_id in self.category_ids if category_id in kept
+        ]
+        for start in range(0, len(counts), BATCH_SIZE):
+            self.session.execute(update(Category), counts[start:start + BATCH_SIZE])
+        self.session.commit()
+
 def setup_database(database_url):
     logger.info("Starting database setup...")
     
@@ -65,79 +146,13 @@ def setup_database(database_url):
             return
         
         logger.info("Starting data import...")
-        # Store categories with their clues
-        categories = {}
-        category_counter = 1
-        clue_counter = 1
-        current_date = datetime.now(timezone.utc)
-        
-        # First pass: Create categories
-        with open('combined_season1-40.tsv', 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file, delimiter='\t')
-            for row in reader:
-                category_title = row['category'].strip()
-                if category_title not in categories:
-                    category = Category(
-                        id=category_counter,
-                        title=category_title,
-                        created_at=current_date,
-                        updated_at=current_date,
-                        clues_count=0
-                    )
-                    categories[category_title] = category
-                    session.add(category)
-                    category_counter += 1
-        
-        # Commit categories to get their IDs
-        session.commit()
-        logger.info(f"Created {len(categories)} categories")
-        
-        # Second pass: Create clues and update category counts
-        category_clue_counts = {}
-        with open('combined_season1-40.tsv', 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file, delimiter='\t')
-            for row in reader:
-                category_title = row['category'].strip()
-                category = categories[category_title]
-                
-                # Create clue
-                clue = Clue(
-                    id=clue_counter,
-                    answer=row['answer'].strip(),
-                    question=row['comments'].strip(),
-                    value=int(row['clue_value']) if row['clue_value'].isdigit() else 200,
-                    airdate=datetime.strptime(row['air_date'] + "T00:00:00.000Z", "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc),
-                    created_at=current_date,
-                    updated_at=current_date,
-                    category_id=category.id,
-                    game_id=clue_counter,
-                    invalid_count=None
-                )
-                session.add(clue)
-                
-                # Update category clue count
-                if category.id not in category_clue_counts:
-                    category_clue_counts[category.id] = 0
-                category_clue_counts[category.id] += 1
-                
-                clue_counter += 1
-                
-                # Commit every 1000 clues to avoid memory issues
-                if clue_counter % 1000 == 0:
-                    session.commit()
-                    logger.info(f"Imported {clue_counter} clues")
-        
-        # Update category clue counts and remove categories with less than 5 clues
-        for category in categories.values():
-            count = category_clue_counts.get(category.id, 0)
-            if count < 5:
-                session.delete(category)
-            else:
-                category.clues_count = count
-        
-        # Final commit
-        session.commit()
-        logger.info(f"Database setup completed successfully! Imported {len(categories)} categories and {clue_counter} clues")
+        sink = DatabaseSink(session, datetime.now(timezone.utc))
+        result = ingest_tsv('combined_season1-40.tsv', [sink])
+        logger.info(
+            f"Database setup completed successfully! Imported {result.categories} categories and {result.clues} clues, "
+            f"then dropped the {result.categories - len(result.kept)} categories with less than 5 clues"
+        )
+        logger.info("On Postgres, run run_migrations.py to keep the category statistics current")
         
     except Exception as e:
         logger.error(f"Error during database setup: {str(e)}")
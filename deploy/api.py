@@ -1,13 +1,16 @@
 from fastapi import FastAPI, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
-from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
 import random
-import re  # Add import for regular expressions
-import html  # Add import for HTML entity handling
+from category_pool import CategoryPool
+from clue_cleaning import clean_clue_text
+from upstream import Upstream
+from invalid_reports import InvalidReportBuffer
+from metrics import MetricsMiddleware, metrics_response
+from seeding import resolve_seed, seed_cache_control, seeded_random
 
 # Load environment variables
 load_dotenv()
@@ -37,22 +40,56 @@ async def protection_bypass_middleware(request: Request, call_next):
         # If no bypass header, return 403 Forbidden
         return Response(status_code=403, content="Authentication required")
 
-# Initialize Supabase client
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+# Per-route latency, payload and upstream-call metrics, served on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Initialize the async Supabase (PostgREST) client
+upstream = Upstream.from_env()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics for this instance."""
+    return metrics_response()
+
+# Seeded responses only change when the corpus does
+SEED_CACHE_MAX_AGE = int(os.getenv("SEED_CACHE_MAX_AGE", "86400"))
+
+async def sample_clues(count: int, final_only: bool, seed: Optional[str] = None) -> list:
+    """Sample clues with their categories, the same ones every time for a given seed."""
+    # Sample random clues with their categories in the database
+    args = {"sample_size": count, "final_only": final_only}
+    if seed is not None:
+        args["seed"] = seed
+    clues = await upstream.rpc("random_clues", args)
+
+    # Randomize the results; the RPC returns seeded rows in no particular order
+    if seed is not None:
+        clues.sort(key=lambda clue: clue["id"])
+        seeded_random(seed, "final" if final_only else "random").shuffle(clues)
+    else:
+        random.shuffle(clues)
+    return clues[:count]
+
+def set_seed_headers(response: Response, daily: bool):
+    response.headers["Cache-Control"] = seed_cache_control(daily, SEED_CACHE_MAX_AGE)
 
 @app.get("/api/random")
-async def get_random_clues(count: Optional[int] = Query(1, le=100)):
-    """Get random clues with their categories."""
+async def get_random_clues(
+    response: Response,
+    count: Optional[int] = Query(1, le=100),
+    seed: Optional[str] = Query(None, min_length=1, max_length=64),
+    daily: bool = False
+):
+    """Get random clues with their categories.
+
+    The same `seed` always returns the same clues; `daily=true` seeds with the
+    UTC date (and overrides `seed`). Seeded responses are cacheable.
+    """
     try:
-        # Get random clues with their categories
-        response = supabase.table("clues").select("*, categories(*)").limit(count).execute()
-        clues = response.data
-        
-        # Randomize the results
-        random.shuffle(clues)
-        clues = clues[:count]
+        resolved = resolve_seed(seed, daily)
+        clues = await sample_clues(count, False, resolved)
+        if resolved is not None:
+            set_seed_headers(response, daily)
         
         # Transform the data to match the expected format
         if clues:
@@ -74,16 +111,19 @@ async def get_random_clues(count: Optional[int] = Query(1, le=100)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/final")
-async def get_final_clues(count: Optional[int] = Query(1, le=100)):
-    """Get random final jeopardy clues."""
+async def get_final_clues(
+    response: Response,
+    count: Optional[int] = Query(1, le=100),
+    seed: Optional[str] = Query(None, min_length=1, max_length=64),
+    daily: bool = False
+):
+    """Get random final jeopardy clues, seeded like /api/random."""
     try:
-        # Get clues with null value (final jeopardy) and their categories
-        response = supabase.table("clues").select("*, categories(*)").is_("value", "null").limit(count).execute()
-        clues = response.data
-        
-        # Randomize the results
-        random.shuffle(clues)
-        return clues[:count]
+        resolved = resolve_seed(seed, daily)
+        clues = await sample_clues(count, True, resolved)
+        if resolved is not None:
+            set_seed_headers(response, daily)
+        return clues
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -98,25 +138,22 @@ async def get_clues(
 ):
     """Get clues with optional filters."""
     try:
-        query = supabase.table("clues").select("*, categories(*)")
+        filters = []
         
         # Apply filters
         if value is not None:
-            query = query.eq("value", value)
+            filters.append(("value", f"eq.{value}"))
         if min_date:
-            query = query.gte("airdate", min_date)
+            filters.append(("airdate", f"gte.{min_date}"))
         if max_date:
-            query = query.lte("airdate", max_date)
+            filters.append(("airdate", f"lte.{max_date}"))
         if game_id:
-            query = query.eq("game_id", game_id)
+            filters.append(("game_id", f"eq.{game_id}"))
         if category:
-            query = query.eq("category_id", category)
+            filters.append(("category_id", f"eq.{category}"))
             
         # Add pagination
-        query = query.range(offset, offset + 99)
-        
-        response = query.execute()
-        return response.data
+        return await upstream.select("clues", "*, categories(*)", filters, limit=100, offset=offset)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -127,113 +164,254 @@ async def get_categories(
 ):
     """Get categories with pagination."""
     try:
-        response = supabase.table("categories").select("*").range(offset, offset + count - 1).execute()
-        return response.data
+        return await upstream.select("categories", "*", limit=count, offset=offset)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def format_clue(clue: dict) -> dict:
+    """Format a clue for the Flutter app, preferring the text cleaned at ingestion."""
+    question = clue.get("clean_question")
+    answer = clue.get("clean_answer")
+    
+    # Rows ingested before the clean columns existed are cleaned on the fly
+    if question is None or answer is None:
+        question, answer = clean_clue_text(clue.get("question", ""), clue.get("answer", ""))
+    
+    return {
+        "answer": answer,
+        "question": question
+    }
+
+async def load_eligible_category_ids() -> List[int]:
+    """Get the ids of all categories with enough valid clues, a page at a time.
+
+    valid_clues_count is kept current by triggers and indexed for this query.
+    """
+    ids = []
+    filters = [("valid_clues_count", "gte.4")]
+    while True:
+        rows = await upstream.select("categories", "id", filters, order="id", limit=1000)
+        ids.extend(row["id"] for row in rows)
+        if len(rows) < 1000:
+            return ids
+        filters = [("valid_clues_count", "gte.4"), ("id", f"gt.{rows[-1]['id']}")]
+
+async def build_category_entries(category_ids: List[int], rng: Optional[random.Random] = None) -> List[dict]:
+    """Fetch a batch of categories in one query and format 4 random clues from each.
+
+    Only clues nobody has reported invalid are embedded, the same ones
+    valid_clues_count counts. Entries follow the order of `category_ids`;
+    a seeded `rng` picks the same clues every time.
+    """
+    id_list = ",".join(str(category_id) for category_id in category_ids)
+    rows = await upstream.select("categories", "*, clues(*)", [
+        ("id", f"in.({id_list})"),
+        ("clues.or", "(invalid_count.is.null,invalid_count.eq.0)")
+    ])
+    position = {category_id: index for index, category_id in enumerate(category_ids)}
+    rows.sort(key=lambda row: position.get(row["id"], len(position)))
+    
+    entries = []
+    for category in rows:
+        clues = category.get("clues", [])
+        if len(clues) < 4:
+            continue
+        
+        # Randomly select 4 clues from this category (embedded rows come back in no fixed order)
+        clues = sorted(clues, key=lambda clue: clue["id"])
+        formatted_clues = [format_clue(clue) for clue in (rng or random).sample(clues, 4)]
+        
+        # Format the response to match what the Flutter app expects
+        entries.append({
+            "title": category["title"],
+            "clues_count": len(formatted_clues),
+            "clues": formatted_clues
+        })
+    return entries
+
+# Ready-to-serve categories for /api/category, refilled in the background
+category_pool = CategoryPool(
+    load_eligible_category_ids,
+    build_category_entries,
+    size=int(os.getenv("CATEGORY_POOL_SIZE", "50")),
+    ids_refresh_seconds=float(os.getenv("CATEGORY_IDS_REFRESH_SECONDS", "600"))
+)
+
+async def write_invalid_reports(batch: Dict[int, int]):
+    await upstream.rpc("increment_invalid_counts", {"clue_ids": list(batch), "deltas": list(batch.values())})
+
+# Invalid-clue reports, coalesced per clue and written behind in batches
+invalid_reports = InvalidReportBuffer(
+    write_invalid_reports,
+    max_pending=int(os.getenv("INVALID_REPORTS_MAX_PENDING", "500")),
+    flush_seconds=float(os.getenv("INVALID_REPORTS_FLUSH_SECONDS", "5"))
+)
+
+@app.on_event("startup")
+async def startup():
+    await invalid_reports.start()
+    await category_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await category_pool.stop()
+    # Drain buffered reports while the upstream client is still open
+    await invalid_reports.stop()
+    await upstream.close()
+
+# A seeded /api/category tries this many categories in one query, in seeded order
+SEEDED_CATEGORY_CANDIDATES = 5
+
+async def seeded_category(seed: str) -> Optional[dict]:
+    """Pick the same category and clues for the same seed, bypassing the pool."""
+    if not category_pool.eligible_ids:
+        await category_pool.refresh_ids()
+    eligible_ids = category_pool.eligible_ids
+    if not eligible_ids:
+        return None
+    rng = seeded_random(seed, "category")
+    candidates = rng.sample(eligible_ids, min(SEEDED_CATEGORY_CANDIDATES, len(eligible_ids)))
+    entries = await build_category_entries(candidates, rng)
+    return entries[0] if entries else None
+
 @app.get("/api/category")
-async def get_single_category(id: int):
-    """Get a single category with all its clues."""
+async def get_single_category(
+    response: Response,
+    id: int,
+    seed: Optional[str] = Query(None, min_length=1, max_length=64),
+    daily: bool = False
+):
+    """Get a random category with 4 of its clues, seeded like /api/random."""
     try:
-        # Get a random category ID from categories with enough clues
-        category_response = supabase.table("categories") \
-            .select("id") \
-            .gte("clues_count", 4) \
-            .execute()
+        resolved = resolve_seed(seed, daily)
+        if resolved is not None:
+            category = await seeded_category(resolved)
+            set_seed_headers(response, daily)
+        else:
+            category = category_pool.pop()
+            if category is None:
+                category = await category_pool.fetch_one()
         
-        if not category_response.data:
+        if category is None:
             raise HTTPException(status_code=404, detail="No categories found with enough clues")
         
-        # Select a random category ID
-        random_category = random.choice(category_response.data)
-        category_id = random_category["id"]
-        
-        # Get the specific category and its clues
-        response = supabase.table("categories") \
-            .select("*, clues(*)") \
-            .eq("id", category_id) \
-            .single() \
-            .execute()
-            
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Category not found")
-            
-        category = response.data
-        clues = category.get("clues", [])
-            
-        if clues and len(clues) >= 4:
-            # Randomly select 4 clues from this category
-            random.shuffle(clues)
-            selected_clues = clues[:4]
-            
-            # Clean and format the clues
-            formatted_clues = []
-            for clue in selected_clues:
-                # Get the question and answer
-                question = clue.get("question", "").strip()
-                answer = clue.get("answer", "").strip()
-                
-                # Remove HTML tags
-                question = re.sub(r'<[^>]+>', '', question)
-                answer = re.sub(r'<[^>]+>', '', answer)
-                
-                # Unescape HTML entities
-                question = html.unescape(question)
-                answer = html.unescape(answer)
-                
-                # Remove quotes and italics markers
-                answer = answer.replace('"', '').replace("'", "").replace("<i>", "").replace("</i>", "")
-                
-                # If question is empty but answer isn't, swap them
-                if not question and answer:
-                    question = answer
-                    # Try to extract a reasonable answer from the question
-                    answer_parts = question.split(',')
-                    if len(answer_parts) > 1:
-                        answer = answer_parts[-1].strip()
-                    else:
-                        words = question.split()
-                        if len(words) > 3:
-                            answer = ' '.join(words[-3:]).strip()
-                        else:
-                            answer = question
-                
-                formatted_clues.append({
-                    "answer": answer,
-                    "question": question
-                })
-            
-            # Format the response to match what the Flutter app expects
-            return {
-                "title": category["title"],
-                "clues_count": len(formatted_clues),
-                "clues": formatted_clues
-            }
-        else:
-            raise HTTPException(status_code=404, detail="Could not find a category with enough clues")
+        return category
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
-@app.post("/api/mark_invalid")
-async def mark_clue_invalid(clue_id: int):
-    """Mark a clue as invalid by incrementing its invalid_count."""
-    try:
-        # Get current invalid_count
-        response = supabase.table("clues").select("invalid_count").eq("id", clue_id).execute()
+# Sampling a board gives up after this many batches of categories
+BOARD_ATTEMPTS = 3
+
+def board_column(category: dict, clue_count: int, round: str) -> Optional[dict]:
+    """Pick one clue per value for a board column, ordered by value.
+
+    Jeopardy takes the category's lowest `clue_count` values and Double
+    Jeopardy its highest; categories with fewer distinct values are skipped.
+    """
+    by_value: Dict[int, List[dict]] = {}
+    for clue in category.get("clues", []):
+        if clue.get("value"):
+            by_value.setdefault(clue["value"], []).append(clue)
+    if len(by_value) < clue_count:
+        return None
+    
+    values = sorted(by_value)
+    values = values[:clue_count] if round == "jeopardy" else values[-clue_count:]
+    clues = []
+    for value in values:
+        clue = random.choice(by_value[value])
+        clues.append({"id": clue["id"], "value": value, **format_clue(clue)})
+    return {"id": category["id"], "title": category["title"], "clues": clues}
+
+async def build_board_columns(category_count: int, clue_count: int, round: str) -> List[dict]:
+    """Sample distinct eligible categories and build their columns, one query per batch."""
+    if not category_pool.eligible_ids:
+        await category_pool.refresh_ids()
+    eligible_ids = category_pool.eligible_ids
+    
+    columns = []
+    seen = set()
+    for _ in range(BOARD_ATTEMPTS):
+        remaining = [category_id for category_id in eligible_ids if category_id not in seen]
+        # Oversample: some categories won't have enough distinct values
+        batch = random.sample(remaining, min(len(remaining), (category_count - len(columns)) * 2))
+        if not batch:
+            break
+        seen.update(batch)
         
-        if not response.data:
-            raise HTTPException(status_code=404, detail="Clue not found")
-            
-        current_count = response.data[0]["invalid_count"] or 0
+        id_list = ",".join(str(category_id) for category_id in batch)
+        rows = await upstream.select(
+            "categories",
+            "id, title, clues(id, question, answer, clean_question, clean_answer, value)",
+            [
+                ("id", f"in.({id_list})"),
+                ("clues.value", "not.is.null"),
+                # Reported clues stay off the board, as they do in the category pool
+                ("clues.or", "(invalid_count.is.null,invalid_count.eq.0)")
+            ]
+        )
+        for category in rows:
+            column = board_column(category, clue_count, round)
+            if column:
+                columns.append(column)
+                if len(columns) == category_count:
+                    return columns
+    return columns
+
+async def build_final_columns(category_count: int) -> List[dict]:
+    """Final Jeopardy: one clue from each of `category_count` distinct categories."""
+    # Oversample so clues sharing a category can be dropped
+    clues = await upstream.rpc("random_clues", {"sample_size": category_count * 2, "final_only": True})
+    random.shuffle(clues)
+    
+    columns = {}
+    for clue in clues:
+        category = clue.get("categories") or {}
+        if category.get("id") is None or category["id"] in columns:
+            continue
+        columns[category["id"]] = {
+            "id": category["id"],
+            "title": category["title"],
+            "clues": [{"id": clue["id"], "value": None, **format_clue(clue)}]
+        }
+        if len(columns) == category_count:
+            break
+    return list(columns.values())
+
+@app.get("/api/board")
+async def get_board(
+    categories: int = Query(6, ge=1, le=12),
+    clues: int = Query(5, ge=1, le=10),
+    round: str = Query("jeopardy", pattern="^(jeopardy|double|final)$")
+):
+    """Get a complete board for one round in a single request.
+
+    Each of `categories` distinct categories comes with `clues` clues ordered
+    by value; the final round has one clue per category.
+    """
+    try:
+        if round == "final":
+            columns = await build_final_columns(categories)
+        else:
+            columns = await build_board_columns(categories, clues, round)
         
-        # Update invalid_count
-        response = supabase.table("clues").update({"invalid_count": current_count + 1}).eq("id", clue_id).execute()
+        if len(columns) < categories:
+            raise HTTPException(status_code=404, detail="Not enough categories found for a full board")
         
-        return response.data[0]
+        return {"round": round, "categories": columns}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/mark_invalid", status_code=202)
+async def mark_clue_invalid(clue_id: int):
+    """Report a clue as invalid; its invalid_count is incremented with the next batch write."""
+    pending = invalid_reports.add(clue_id)
+    return {"id": clue_id, "pending_reports": pending}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
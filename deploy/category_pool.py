@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import CACHE_LOOKUPS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CategoryPool:
+    """Queue of pre-selected, pre-cleaned categories refilled in the background.
+
+    `load_ids` returns every eligible category id and is re-run on a timer.
+    `build_entries` turns a batch of ids into ready-to-serve responses in a
+    single upstream query.
+    """
+
+    def __init__(
+        self,
+        load_ids: Callable[[], Awaitable[List[int]]],
+        build_entries: Callable[[List[int]], Awaitable[List[Dict[str, Any]]]],
+        size: int = 50,
+        batch_size: int = 10,
+        ids_refresh_seconds: float = 600
+    ):
+        self.load_ids = load_ids
+        self.build_entries = build_entries
+        self.size = size
+        self.batch_size = batch_size
+        self.ids_refresh_seconds = ids_refresh_seconds
+        self.eligible_ids: List[int] = []
+        self.entries: deque = deque(maxlen=size)
+        self._wanted = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        try:
+            await self.refresh_ids()
+        except Exception as e:
+            logger.error(f"Could not load eligible category ids: {str(e)}")
+        self._tasks = [
+            asyncio.create_task(self._refill_loop()),
+            asyncio.create_task(self._ids_loop()),
+        ]
+        self._wanted.set()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def pop(self) -> Optional[Dict[str, Any]]:
+        """Take a ready category off the pool, or None if it has run dry."""
+        self._wanted.set()
+        try:
+            entry = self.entries.popleft()
+        except IndexError:
+            CACHE_LOOKUPS.inc("category_pool", "miss")
+            return None
+        CACHE_LOOKUPS.inc("category_pool", "hit")
+        return entry
+
+    async def fetch_one(self) -> Optional[Dict[str, Any]]:
+        """Build a category on the request path when the pool is empty."""
+        if not self.eligible_ids:
+            await self.refresh_ids()
+        entries = await self._build_batch()
+        if not entries:
+            return None
+        # Keep the rest of the batch for the next requests
+        self.entries.extend(entries[1:])
+        return entries[0]
+
+    async def refresh_ids(self):
+        ids = await self.load_ids()
+        self.eligible_ids = ids
+        logger.info(f"Category pool has {len(ids)} eligible categories")
+
+    async def _build_batch(self) -> List[Dict[str, Any]]:
+        ids = self.eligible_ids
+        if not ids:
+            return []
+        batch = random.sample(ids, min(self.batch_size, len(ids)))
+        return await self.build_entries(batch)
+
+    async def _refill_loop(self):
+        while True:
+            await self._wanted.wait()
+            self._wanted.clear()
+            while len(self.entries) < self.size:
+                try:
+                    entries = await self._build_batch()
+                except Exception as e:
+                    logger.error(f"Category pool refill failed: {str(e)}")
+                    await asyncio.sleep(5)
+                    break
+                if not entries:
+                    break
+                self.entries.extend(entries)
+
+    async def _ids_loop(self):
+        while True:
+            await asyncio.sleep(self.ids_refresh_seconds)
+            try:
+                await self.refresh_ids()
+            except Exception as e:
+                logger.error(f"Could not refresh eligible category ids: {str(e)}")
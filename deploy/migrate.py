@@ -3,16 +3,16 @@ import sqlite3
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import time
+from typing import Optional
 from datetime import datetime, timezone
 import backoff
+from clue_cleaning import clean_clue_text
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Supabase client
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+# Supabase client, created by main()
+supabase: Optional[Client] = None
 
 def unix_to_iso(unix_timestamp):
     try:
@@ -27,13 +27,11 @@ def safe_supabase_operation(operation_func):
     return operation_func()
 
 def process_remaining_categories(cursor, start_id=77500, chunk_size=100):
-    # Get remaining categories with their clue counts
+    # Get remaining categories; their clue counts are maintained by triggers on clues
     cursor.execute("""
-        SELECT c.id, c.name, COUNT(cl.id) as clues_count
+        SELECT c.id, c.name
         FROM categories c
-        LEFT JOIN clues cl ON c.id = cl.category_id
         WHERE c.id > ?
-        GROUP BY c.id, c.name
         ORDER BY c.id
     """, (start_id,))
     
@@ -50,8 +48,7 @@ def process_remaining_categories(cursor, start_id=77500, chunk_size=100):
                 'id': row[0],  # id
                 'title': row[1],  # name
                 'created_at': now,
-                'updated_at': now,
-                'clues_count': row[2]  # clues_count
+                'updated_at': now
             })
         
         if categories:
@@ -100,11 +97,14 @@ def process_clues(cursor, start_id=0, chunk_size=500):
             # Skip if question or answer is null
             if not row[1] or not row[2]:
                 continue
-                
+            
+            clean_question, clean_answer = clean_clue_text(row[1], row[2])
             clues.append({
                 'id': row[0],  # id
                 'question': row[1] or "",  # question (default to empty string if null)
                 'answer': row[2] or "",  # answer (default to empty string if null)
+                'clean_question': clean_question,
+                'clean_answer': clean_answer,
                 'value': row[3] if row[3] is not None else 0,  # value
                 'airdate': airdate,  # episode date
                 'created_at': now,
@@ -154,15 +154,17 @@ def process_final_clues(cursor, chunk_size=500):
                 'id': 1000000 + row[0],  # Use high numbers to avoid conflicts
                 'title': row[1] or "Final Jeopardy",  # category (default if null)
                 'created_at': now,
-                'updated_at': now,
-                'clues_count': 1
+                'updated_at': now
             })
             
+            clean_question, clean_answer = clean_clue_text(row[3], row[4])
             finals.append({
                 'id': 1000000 + row[0],  # Use high numbers to avoid conflicts
                 'question': row[3] or "",  # question (default to empty string if null)
                 'answer': row[4] or "",  # answer (default to empty string if null)
-                'value': 0,  # Final clues don't have values
+                'clean_question': clean_question,
+                'clean_answer': clean_answer,
+                'value': None,  # Final clues don't have values; random_clues(final_only) looks for NULL
                 'airdate': now,
                 'created_at': now,
                 'updated_at': now,
@@ -197,6 +199,9 @@ def process_final_clues(cursor, chunk_size=500):
         time.sleep(0.5)  # Reduced rate limiting
 
 def main():
+    global supabase
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+
     # Connect to SQLite database
     conn = sqlite3.connect('../jarchive/db.db')
     cursor = conn.cursor()
@@ -1,93 +1,182 @@
 import sqlite3
+import argparse
+import gzip
 import json
 import logging
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_categories_with_clues(db_path: str) -> List[Dict[str, Any]]:
-    """Get all categories with their associated clues from the SQLite database."""
+# Rows pulled from the cursor at a time
+FETCH_SIZE = 10000
+
+# Categories per output file
+CHUNK_SIZE = 1000
+
+def iter_categories_with_clues(db_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield each category with its clues, reading the join a batch of rows at a time.
+
+    The query is ordered by category id, so a category is complete as soon
+    as a row for the next one arrives; only that one is held in memory.
+    """
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    # Get all categories with their clues
-    cursor.execute("""
-        SELECT 
-            c.id,
-            c.name as title,
-            c.notes,
-            c.index,
-            cl.id as clue_id,
-            cl.value,
-            cl.index as clue_index,
-            cl.question,
-            cl.answer,
-            cl.notes as clue_notes,
-            cl.double
-        FROM categories c
-        LEFT JOIN clues cl ON c.id = cl.category_id
-        ORDER BY c.id, cl.index
-    """)
-    
-    # Organize the data into categories with their clues
-    categories: Dict[int, Dict[str, Any]] = {}
-    
-    for row in cursor.fetchall():
-        cat_id = row[0]
-        if cat_id not in categories:
-            categories[cat_id] = {
-                "id": cat_id,
-                "title": row[1],
-                "notes": row[2],
-                "index": row[3],
-                "created_at": "2024-03-06T00:00:00Z",  # Default timestamp
-                "updated_at": "2024-03-06T00:00:00Z",  # Default timestamp
-                "clues": []
-            }
+    try:
+        # Get all categories with their clues
+        cursor.execute("""
+            SELECT 
+                c.id,
+                c.name as title,
+                c.notes,
+                c."index",
+                cl.id as clue_id,
+                cl.value,
+                cl."index" as clue_index,
+                cl.question,
+                cl.answer,
+                cl.notes as clue_notes,
+                cl.double
+            FROM categories c
+            LEFT JOIN clues cl ON c.id = cl.category_id
+            ORDER BY c.id, cl."index"
+        """)
         
-        if row[4]:  # If there's a clue
-            categories[cat_id]["clues"].append({
-                "id": row[4],
-                "value": row[5],
-                "index": row[6],
-                "question": row[7],
-                "answer": row[8],
-                "notes": row[9],
-                "double": row[10],
-                "created_at": "2024-03-06T00:00:00Z",  # Default timestamp
-                "updated_at": "2024-03-06T00:00:00Z",  # Default timestamp
-                "category_id": cat_id,
-                "game_id": 0,  # Default value
-                "invalid_count": 0  # Default value
-            })
-    
-    conn.close()
-    return list(categories.values())
+        category = None
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                cat_id = row[0]
+                if category is None or category["id"] != cat_id:
+                    if category is not None:
+                        yield category
+                    category = {
+                        "id": cat_id,
+                        "title": row[1],
+                        "notes": row[2],
+                        "index": row[3],
+                        "created_at": "2024-03-06T00:00:00Z",  # Default timestamp
+                        "updated_at": "2024-03-06T00:00:00Z",  # Default timestamp
+                        "clues": []
+                    }
+                
+                if row[4]:  # If there's a clue
+                    category["clues"].append({
+                        "id": row[4],
+                        "value": row[5],
+                        "index": row[6],
+                        "question": row[7],
+                        "answer": row[8],
+                        "notes": row[9],
+                        "double": row[10],
+                        "created_at": "2024-03-06T00:00:00Z",  # Default timestamp
+                        "updated_at": "2024-03-06T00:00:00Z",  # Default timestamp
+                        "category_id": cat_id,
+                        "game_id": 0,  # Default value
+                        "invalid_count": 0  # Default value
+                    })
+        if category is not None:
+            yield category
+    finally:
+        conn.close()
+
+def get_categories_with_clues(db_path: str) -> List[Dict[str, Any]]:
+    """Get all categories with their associated clues from the SQLite database."""
+    return list(iter_categories_with_clues(db_path))
+
+class ChunkWriter:
+    """Writes one chunk file a category at a time.
+
+    Pretty output is byte for byte what `json.dump({"categories": chunk},
+    indent=2)` produced; compact output drops the whitespace; NDJSON writes
+    one category object per line instead of a wrapping document.
+    """
+
+    def __init__(self, path: Path, compact: bool = False, ndjson: bool = False, compress: bool = False):
+        self.file = gzip.open(path, "wt", encoding="utf-8") if compress else open(path, "w", encoding="utf-8")
+        self.compact = compact or ndjson
+        self.ndjson = ndjson
+        self.count = 0
+        if not ndjson:
+            self.file.write('{"categories":[' if compact else '{\n  "categories": [')
+
+    def write(self, category: Dict[str, Any]):
+        if self.compact:
+            text = json.dumps(category, ensure_ascii=False, separators=(",", ":"))
+        else:
+            # Nested two levels down in the wrapping document
+            text = json.dumps(category, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+        if self.ndjson:
+            self.file.write(text + "\n")
+        elif self.compact:
+            self.file.write(("," if self.count else "") + text)
+        else:
+            self.file.write(("," if self.count else "") + "\n    " + text)
+        self.count += 1
+
+    def close(self):
+        if not self.ndjson:
+            self.file.write("]}" if self.compact else "\n  ]\n}")
+        self.file.close()
+
+def export_chunks(categories: Iterator[Dict[str, Any]], output_dir: Path, compact: bool = False,
+                  ndjson: bool = False, compress: bool = False) -> int:
+    """Stream categories into chunk_<n> files of CHUNK_SIZE categories; returns how many were written."""
+    suffix = (".ndjson" if ndjson else ".json") + (".gz" if compress else "")
+    writer = None
+    total = 0
+    try:
+        for category in categories:
+            if writer is None:
+                output_file = output_dir / f"chunk_{total // CHUNK_SIZE + 1}{suffix}"
+                logger.info(f"Writing categories to {output_file}...")
+                writer = ChunkWriter(output_file, compact, ndjson, compress)
+            writer.write(category)
+            total += 1
+            if writer.count == CHUNK_SIZE:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
 
 def main():
-    """Main function to export SQLite data to JSON files."""
-    db_path = "jarchive/db.db"
-    output_dir = Path("json_seasons")
-    output_dir.mkdir(exist_ok=True)
+    """Main function to export SQLite data to JSON files or a snapshot file."""
+    parser = argparse.ArgumentParser(description="Export the j-archive SQLite database.")
+    parser.add_argument("--db", default="jarchive/db.db")
+    parser.add_argument(
+        "--format", choices=("json", "snapshot"), default="json",
+        help="json: chunk_<n>.json files of 1000 categories; snapshot: one memory-mappable file for SNAPSHOT_FILE"
+    )
+    parser.add_argument("--output", help="output directory for json (default json_seasons), file for snapshot (default jservice.snapshot)")
+    parser.add_argument("--compact", action="store_true", help="write JSON without indentation or spaces")
+    parser.add_argument("--ndjson", action="store_true", help="write one category per line (chunk_<n>.ndjson) instead of a JSON document")
+    parser.add_argument("--gzip", action="store_true", help="gzip each chunk file (adds .gz)")
+    args = parser.parse_args()
+    db_path = args.db
     
     try:
         logger.info("Reading data from SQLite database...")
-        categories = get_categories_with_clues(db_path)
+        categories = iter_categories_with_clues(db_path)
+        
+        if args.format == "snapshot":
+            # snapshot_file needs fcntl (Unix only); keep the JSON export portable
+            from snapshot_file import write_categories
+            write_categories(args.output or "jservice.snapshot", categories)
+            return
+        
+        output_dir = Path(args.output or "json_seasons")
+        output_dir.mkdir(exist_ok=True)
         
-        # Split categories into chunks of 1000 for manageable file sizes
-        chunk_size = 1000
-        for i in range(0, len(categories), chunk_size):
-            chunk = categories[i:i + chunk_size]
-            output_file = output_dir / f"chunk_{i//chunk_size + 1}.json"
-            
-            logger.info(f"Writing {len(chunk)} categories to {output_file}...")
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump({"categories": chunk}, f, indent=2, ensure_ascii=False)
-            
-        logger.info(f"Successfully exported {len(categories)} categories to {output_dir}")
+        # Split categories into chunks of 1000 for manageable file sizes, one chunk in memory at most
+        total = export_chunks(categories, output_dir, args.compact, args.ndjson, args.gzip)
+        logger.info(f"Successfully exported {total} categories to {output_dir}")
         
     except Exception as e:
         logger.error(f"Error exporting data: {str(e)}")
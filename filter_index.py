@@ -0,0 +1,256 @@
+import bisect
+import re
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
+
+from clue_table import NULLS_LAST_DAY, ClueTable, airdate_sort_day
+
+# A condition matching fewer than 1/SPARSE_FRACTION of the rows is answered
+# with a row list; anything denser is a bitmap over row numbers
+SPARSE_FRACTION = 64
+
+# The airdate order is cut into this many blocks with a prefix bitmap at each
+# boundary, so a date range costs two XORed bitmaps plus at most two partial blocks
+RANGE_BLOCKS = 32
+
+NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+# Rows in id order, or a little-endian bitmap with bit `row` set for each match
+Match = Union[Sequence[int], bytes]
+
+# The arrays a FilterIndex is made of, in the order a snapshot file stores them
+FILTER_ARRAYS = (
+    "days",
+    "dense_values", "dense_counts", "dense_bitmaps",
+    "value_keys", "value_offsets", "value_rows",
+    "game_keys", "game_offsets", "game_rows",
+    "prefix_bitmaps",
+)
+
+
+def rows_to_bitmap(rows: Sequence[int], size: int) -> int:
+    data = bytearray((size + 7) // 8)
+    for row in rows:
+        data[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(data, "little")
+
+
+def bitmap_rows(bitmap: bytes, start: int = 0) -> Iterator[int]:
+    """Set bits of `bitmap` in ascending order, from bit `start` on.
+
+    Zero bytes are skipped by the regex engine, so sparse stretches cost
+    next to nothing.
+    """
+    for match in NONZERO_BYTE.finditer(bitmap, start >> 3):
+        base = match.start() << 3
+        byte = bitmap[match.start()]
+        while byte:
+            low = byte & -byte
+            row = base + low.bit_length() - 1
+            if row >= start:
+                yield row
+            byte ^= low
+
+
+def group_rows(column: Sequence[int], rows: Iterable[int]) -> Tuple[array, array, array]:
+    """Group `rows` by their value in `column`: (keys, offsets, rows).
+
+    The rows with `keys[i]` are `rows[offsets[i]:offsets[i + 1]]`, still in
+    id order since sorted() is stable.
+    """
+    grouped = array("i", sorted(rows, key=column.__getitem__))
+    keys, offsets = array("q"), array("q")
+    for position, row in enumerate(grouped):
+        key = column[row]
+        if not keys or keys[-1] != key:
+            keys.append(key)
+            offsets.append(position)
+    offsets.append(len(grouped))
+    return keys, offsets, grouped
+
+
+def grouped_rows(keys: Sequence[int], offsets: Sequence[int], rows: Sequence[int], key: int) -> Sequence[int]:
+    position = bisect.bisect_left(keys, key)
+    if position == len(keys) or keys[position] != key:
+        return rows[0:0]
+    return rows[offsets[position]:offsets[position + 1]]
+
+
+def bitmap_contains(bitmap: bytes, row: int) -> bool:
+    return bool(bitmap[row >> 3] >> (row & 7) & 1)
+
+
+class Condition(NamedTuple):
+    count: int
+    rows: Callable[[], Sequence[int]]   # matching rows in id order
+    bitmap: Callable[[], int]
+    accept: Callable[[int], bool]
+
+
+class FilterIndex:
+    """Answers any combination of the /api/clues filters without a table scan.
+
+    Common values get a bitmap over clue rows, rare values, games and
+    categories a row list, and airdates a sorted array searched with
+    bisect. The most selective condition drives the lookup: if it is sparse
+    its rows are checked against the others, otherwise the bitmaps are
+    intersected. Rows are in id order, so results are too.
+
+    Everything is kept in flat arrays (see FILTER_ARRAYS): row lists are
+    grouped by key with an offset table, like the table's category_order,
+    and bitmaps are concatenated, so the index can be stored in and mapped
+    from a snapshot file along with the columns.
+    """
+
+    def __init__(self, table: ClueTable, by_airdate: Sequence[int], arrays: Optional[Dict[str, Sequence[int]]] = None):
+        self.table = table
+        self.size = len(table)
+        self.by_airdate = by_airdate
+        self.bitmap_bytes = (self.size + 7) // 8
+        self.sparse_limit = max(1, self.size // SPARSE_FRACTION)
+        self.block = max(1, -(-self.size // RANGE_BLOCKS))
+        if arrays is None:
+            arrays = self.build_arrays()
+        for name in FILTER_ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def build_arrays(self) -> Dict[str, Sequence[int]]:
+        """Derive the index arrays from the table and the airdate order."""
+        size, by_airdate = self.size, self.by_airdate
+        airdays = self.table.clues.columns["airdate"]
+        values = self.table.clues.columns["value"]
+        game_ids = self.table.clues.columns["game_id"]
+
+        value_counts = Counter(values)
+        dense_values = array("q", sorted(value for value, count in value_counts.items() if count >= self.sparse_limit))
+        dense_counts = array("q", (value_counts[value] for value in dense_values))
+        dense_bitmaps = bytearray(self.bitmap_bytes * len(dense_values))
+        slot = {value: position * self.bitmap_bytes for position, value in enumerate(dense_values)}
+        sparse = array("i")
+        for row in range(size):
+            base = slot.get(values[row])
+            if base is None:
+                sparse.append(row)
+            else:
+                dense_bitmaps[base + (row >> 3)] |= 1 << (row & 7)
+        value_keys, value_offsets, value_rows = group_rows(values, sparse)
+        game_keys, game_offsets, game_rows = group_rows(game_ids, range(size))
+
+        # Prefix bitmap i holds the first i * block rows in airdate order
+        seen = bytearray(self.bitmap_bytes)
+        prefix_bitmaps = bytearray(seen)
+        for position, row in enumerate(by_airdate, 1):
+            seen[row >> 3] |= 1 << (row & 7)
+            if position % self.block == 0 or position == size:
+                prefix_bitmaps += seen
+
+        return {
+            # Sorted, with clues that have no airdate at the end as NULLS_LAST_DAY
+            "days": array("i", (airdate_sort_day(airdays[row]) for row in by_airdate)),
+            "dense_values": dense_values,
+            "dense_counts": dense_counts,
+            "dense_bitmaps": dense_bitmaps,
+            "value_keys": value_keys,
+            "value_offsets": value_offsets,
+            "value_rows": value_rows,
+            "game_keys": game_keys,
+            "game_offsets": game_offsets,
+            "game_rows": game_rows,
+            "prefix_bitmaps": prefix_bitmaps,
+        }
+
+    def arrays(self) -> Dict[str, Sequence[int]]:
+        return {name: getattr(self, name) for name in FILTER_ARRAYS}
+
+    def nbytes(self) -> int:
+        return sum(memoryview(data).nbytes for data in self.arrays().values())
+
+    def match(
+        self,
+        value: Optional[int] = None,
+        low: Optional[int] = None,
+        high: Optional[int] = None,
+        game_id: Optional[int] = None,
+        category: Optional[int] = None
+    ) -> Optional[Match]:
+        """Rows matching every given filter, or None when no filter is given."""
+        conditions = []
+        if value is not None:
+            conditions.append(self.value_condition(value))
+        if game_id:
+            rows = grouped_rows(self.game_keys, self.game_offsets, self.game_rows, game_id)
+            conditions.append(self.rows_condition(rows, "game_id", game_id))
+        if category:
+            conditions.append(self.rows_condition(self.table.clue_rows_for_category(category), "category_id", category))
+        if low is not None or high is not None:
+            conditions.append(self.airdate_condition(low, high))
+        if not conditions:
+            return None
+
+        conditions.sort(key=lambda condition: condition.count)
+        driver, others = conditions[0], conditions[1:]
+        if driver.count < self.sparse_limit:
+            return [row for row in driver.rows() if all(condition.accept(row) for condition in others)]
+
+        bitmap = driver.bitmap()
+        for condition in others:
+            bitmap &= condition.bitmap()
+        return bitmap.to_bytes(self.bitmap_bytes, "little")
+
+    def value_condition(self, value: int) -> Condition:
+        position = bisect.bisect_left(self.dense_values, value)
+        if position == len(self.dense_values) or self.dense_values[position] != value:
+            rows = grouped_rows(self.value_keys, self.value_offsets, self.value_rows, value)
+            return self.rows_condition(rows, "value", value)
+        data = self.dense_bitmaps[position * self.bitmap_bytes:(position + 1) * self.bitmap_bytes]
+        return Condition(
+            self.dense_counts[position],
+            lambda: list(bitmap_rows(data)),
+            lambda: int.from_bytes(data, "little"),
+            lambda row: bitmap_contains(data, row),
+        )
+
+    def rows_condition(self, rows: Sequence[int], column: str, expected: int) -> Condition:
+        values = self.table.clues.columns[column]
+        return Condition(
+            len(rows),
+            lambda: rows,
+            lambda: rows_to_bitmap(rows, self.size),
+            lambda row: values[row] == expected,
+        )
+
+    def airdate_span(self, low: Optional[int], high: Optional[int]) -> Tuple[int, int]:
+        """Positions [start, end) of the airdate order inside the inclusive day bounds."""
+        if low is None and high is None:
+            return 0, len(self.days)
+        start = 0 if low is None else bisect.bisect_left(self.days, low)
+        # Clues without an airdate never match a date filter
+        end = bisect.bisect_right(self.days, NULLS_LAST_DAY - 1 if high is None else min(high, NULLS_LAST_DAY - 1))
+        return start, max(start, end)
+
+    def airdate_condition(self, low: Optional[int], high: Optional[int]) -> Condition:
+        start, end = self.airdate_span(low, high)
+        airdays = self.table.clues.columns["airdate"]
+        first = self.days[start] if start < end else 0
+        last = self.days[end - 1] if start < end else -1
+        return Condition(
+            end - start,
+            lambda: sorted(self.by_airdate[start:end]),
+            lambda: self.range_bitmap(start, end),
+            lambda row: first <= airdays[row] <= last,
+        )
+
+    def range_bitmap(self, start: int, end: int) -> int:
+        """Bitmap of the rows at positions [start, end) of the airdate order."""
+        first_block = -(-start // self.block)
+        last_block = end // self.block
+        if first_block >= last_block:
+            return rows_to_bitmap(self.by_airdate[start:end], self.size)
+        whole = self.prefix_bitmap(last_block) ^ self.prefix_bitmap(first_block)
+        edges = [*self.by_airdate[start:first_block * self.block], *self.by_airdate[last_block * self.block:end]]
+        return whole | rows_to_bitmap(edges, self.size)
+
+    def prefix_bitmap(self, block: int) -> int:
+        start = block * self.bitmap_bytes
+        return int.from_bytes(self.prefix_bitmaps[start:start + self.bitmap_bytes], "little")
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class InvalidReportBuffer:
+    """Coalesces invalid-clue reports in memory and writes them behind in batches.
+
+    Reports for the same clue merge into one increment. The buffer is flushed
+    through `write` once `max_pending` reports are waiting or every
+    `flush_seconds`, and drained on shutdown. A failed write puts its batch
+    back so the counts are retried with the next flush.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Dict[int, int]], Awaitable[None]],
+        max_pending: int = 500,
+        flush_seconds: float = 5.0
+    ):
+        self.write = write
+        self.max_pending = max_pending
+        self.flush_seconds = flush_seconds
+        self.pending: Counter = Counter()
+        self.pending_reports = 0
+        self._full = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, clue_id: int) -> int:
+        """Queue one report and return how many are pending for that clue."""
+        self.pending[clue_id] += 1
+        self.pending_reports += 1
+        if self.pending_reports >= self.max_pending:
+            self._full.set()
+        return self.pending[clue_id]
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, Counter()
+        self.pending_reports = 0
+        try:
+            await self.write(dict(batch))
+        except Exception as e:
+            logger.error(f"Could not write {sum(batch.values())} invalid reports, will retry: {str(e)}")
+            self.requeue(batch)
+        except asyncio.CancelledError:
+            # Cancelled mid-write: keep the batch for whoever flushes next
+            self.requeue(batch)
+            raise
+
+    def requeue(self, batch: Counter):
+        self.pending.update(batch)
+        self.pending_reports += sum(batch.values())
+
+    async def start(self):
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the background loop and drain whatever is still buffered.
+
+        The loop is asked to stop rather than cancelled, so a write it has
+        in flight completes (or puts its batch back) before the final flush.
+        """
+        if self._task:
+            self._stopping.set()
+            self._full.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
@@ -6,6 +6,7 @@ from pathlib import Path
 from supabase import create_client, Client
 from dotenv import load_dotenv
 from typing import List, Dict, Any
+from clue_cleaning import clean_clue_text
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -42,20 +43,27 @@ def bulk_upsert_categories_and_clues(data: dict, batch_size: int = 1000):
         clues_data = []
         
         for category in data["categories"]:
+            # clues_count and valid_clues_count are maintained by triggers on clues
             categories_data.append({
                 "id": category["id"],
                 "title": category["title"],
                 "created_at": category["created_at"],
-                "updated_at": category["updated_at"],
-                "clues_count": category["clues_count"]
+                "updated_at": category["updated_at"]
             })
             
             if category["clues"]:
                 for clue in category["clues"]:
+                    # Files converted before cleaning moved to ingestion lack the clean text
+                    if "clean_question" in clue and "clean_answer" in clue:
+                        clean_question, clean_answer = clue["clean_question"], clue["clean_answer"]
+                    else:
+                        clean_question, clean_answer = clean_clue_text(clue["question"], clue["answer"])
                     clues_data.append({
                         "id": clue["id"],
                         "answer": clue["answer"],
                         "question": clue["question"],
+                        "clean_question": clean_question,
+                        "clean_answer": clean_answer,
                         "value": clue["value"],
                         "airdate": clue["airdate"],
                         "created_at": clue["created_at"],
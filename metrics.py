@@ -0,0 +1,181 @@
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Response
+
+# Histogram bucket upper bounds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *label_values: str):
+        self.values[label_values] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and two additions."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (the last one is +Inf)], sum
+        self.series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                labels = format_labels(self.labels, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total:g}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "Requests served, by route and status.", ("route", "method", "status"))
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time to serve a request, by route.", ("route",))
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size, by route.", ("route",), SIZE_BUCKETS)
+UPSTREAM_CALLS = Histogram(
+    "upstream_calls_per_request", "Supabase calls made while serving one request, by route.", ("route",), CALL_BUCKETS
+)
+UPSTREAM_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Supabase call latency, including the wait for a connection slot.",
+    ("method", "target")
+)
+UPSTREAM_RESPONSE_SIZE = Histogram(
+    "upstream_response_size_bytes", "Supabase response body size.", ("method", "target"), SIZE_BUCKETS
+)
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Failed Supabase calls, by status (0 for transport errors).", ("target", "status"))
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups, by cache and result.", ("cache", "result"))
+STARTUP_SECONDS = Gauge("startup_seconds", "Time this worker spent in each cold-start phase.", ("phase",))
+
+METRICS = (
+    REQUESTS, REQUEST_DURATION, RESPONSE_SIZE, UPSTREAM_CALLS,
+    UPSTREAM_DURATION, UPSTREAM_RESPONSE_SIZE, UPSTREAM_ERRORS, CACHE_LOOKUPS, STARTUP_SECONDS,
+)
+
+# Upstream calls made on behalf of the current request; None outside requests (background tasks)
+upstream_calls: ContextVar[Optional[List[int]]] = ContextVar("upstream_calls", default=None)
+
+
+def upstream_target(path: str) -> str:
+    """Label for an upstream path: the table, or rpc/<function>."""
+    parts = path.strip("/").split("/")
+    return "/".join(parts[:2]) if parts[0] == "rpc" else parts[0]
+
+
+def record_upstream(method: str, path: str, seconds: float, size: int, status: int):
+    target = upstream_target(path)
+    UPSTREAM_DURATION.observe(seconds, method, target)
+    UPSTREAM_RESPONSE_SIZE.observe(size, method, target)
+    if status >= 400 or status == 0:
+        UPSTREAM_ERRORS.inc(target, str(status))
+    calls = upstream_calls.get()
+    if calls is not None:
+        calls[0] += 1
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response() -> Response:
+    return Response(content=render(), media_type="text/plain; version=0.0.4")
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request, labelled by its route template.
+
+    A plain ASGI wrapper rather than @app.middleware("http") so streamed
+    responses pass straight through; the duration runs until the last body
+    chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+        size = [0]
+        calls = [0]
+        token = upstream_calls.set(calls)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                size[0] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            upstream_calls.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't blow up the series count
+            path = route.path if route is not None else "unmatched"
+            REQUESTS.inc(path, scope["method"], str(status[0]))
+            REQUEST_DURATION.observe(time.perf_counter() - start, path)
+            RESPONSE_SIZE.observe(size[0], path)
+            UPSTREAM_CALLS.observe(calls[0], path)
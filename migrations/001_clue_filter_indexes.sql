@@ -0,0 +1,21 @@
+-- Indexes for the /api/clues filters and the random_clues(final_only) RPC.
+-- Each filter column is paired with id so the index also serves the
+-- `order=id` / `id=gt.` keyset pages: Postgres walks the index in order and
+-- stops after `limit` rows instead of sorting every match.
+
+-- /api/clues?value=...
+create index if not exists idx_clues_value_id on clues (value, id);
+
+-- /api/clues?min_date=...&max_date=... and the sort=airdate cursor
+create index if not exists idx_clues_airdate_id on clues (airdate, id);
+
+-- /api/clues?game_id=...
+create index if not exists idx_clues_game_id_id on clues (game_id, id);
+
+-- /api/clues?category=..., /api/category and /api/board embedding clues(*);
+-- supersedes the single-column idx_clues_category_id from setup.sql
+create index if not exists idx_clues_category_id_id on clues (category_id, id);
+drop index if exists idx_clues_category_id;
+
+-- /api/final: only the few final clues (value is null) are indexed
+create index if not exists idx_clues_final on clues (id) where value is null;
@@ -0,0 +1,3 @@
+-- deploy/api.py pages through the categories with enough clues for a
+-- round (clues_count=gte.4&order=id); index just those, in id order.
+create index if not exists idx_categories_eligible on categories (id) where clues_count >= 4;
@@ -0,0 +1,61 @@
+-- random_clues gains an optional seed. With a seed, the probe ids and the
+-- order they are tried in come from hashing the seed instead of random(),
+-- so the same seed picks the same clues on any connection. setseed() is
+-- avoided because it would leave the pooled session's random() predictable.
+-- The old two-argument version is dropped first: PostgREST can't choose
+-- between overloads that both accept (sample_size, final_only).
+drop function if exists random_clues(integer, boolean);
+
+create or replace function random_clues(
+    sample_size integer default 1,
+    final_only boolean default false,
+    seed text default null
+)
+returns setof jsonb
+language plpgsql
+volatile
+as $$
+declare
+    min_id bigint;
+    max_id bigint;
+    picked bigint[] := '{}';
+    missing integer;
+    oversample integer := case when final_only then 64 else 2 end;
+    attempts integer := 0;
+begin
+    select min(id), max(id) into min_id, max_id from clues;
+    if min_id is null then
+        return;
+    end if;
+
+    loop
+        missing := sample_size - cardinality(picked);
+        exit when missing <= 0 or attempts >= 12;
+        attempts := attempts + 1;
+
+        picked := picked || array(
+            select c.id
+            from (
+                select distinct min_id + case
+                    when seed is null then floor(random() * (max_id - min_id + 1))::bigint
+                    else mod(abs(hashtextextended(seed || ':' || attempts || ':' || n, 0)), max_id - min_id + 1)
+                end as id
+                from generate_series(1, missing * oversample) n
+            ) probe
+            join clues c on c.id = probe.id
+            where (not final_only or c.value is null)
+              and c.id <> all(picked)
+            order by case when seed is null then random() end,
+                     hashtextextended(seed || ':' || c.id, 0)
+            limit missing
+        );
+        oversample := oversample * 2;
+    end loop;
+
+    return query
+        select to_jsonb(c) || jsonb_build_object('categories', to_jsonb(cat))
+        from clues c
+        join categories cat on cat.id = c.category_id
+        where c.id = any(picked);
+end;
+$$;
@@ -0,0 +1,163 @@
+-- Per-category statistics kept current by triggers on clues, replacing the
+-- clues_count the loaders computed in Python:
+--   categories.clues_count        every clue in the category
+--   categories.valid_clues_count  clues nobody has reported invalid
+--   category_value_tiers          how many clues the category has at each value
+-- Statement-level triggers with transition tables fold a whole batch
+-- (a PostgREST bulk upsert, an increment_invalid_counts call) into one
+-- update per category instead of one per clue.
+
+alter table categories add column if not exists valid_clues_count integer default 0 not null;
+
+create table if not exists category_value_tiers (
+    category_id bigint references categories(id) on delete cascade not null,
+    value integer not null,
+    clues_count integer not null,
+    primary key (category_id, value)
+);
+
+alter table category_value_tiers enable row level security;
+
+-- anon is Supabase's API role; a plain Postgres database has neither the role nor the API
+do $$
+begin
+    if exists (select from pg_roles where rolname = 'anon') then
+        drop policy if exists "Public can read category value tiers" on category_value_tiers;
+        create policy "Public can read category value tiers"
+            on category_value_tiers for select
+            to anon
+            using (true);
+    end if;
+end
+$$;
+
+-- Backfill from the clues already loaded
+update categories c
+set clues_count = coalesce(s.clues_count, 0),
+    valid_clues_count = coalesce(s.valid_clues_count, 0)
+from categories base
+left join (
+    select category_id,
+           count(*) as clues_count,
+           count(*) filter (where coalesce(invalid_count, 0) = 0) as valid_clues_count
+    from clues
+    group by category_id
+) s on s.category_id = base.id
+where c.id = base.id;
+
+insert into category_value_tiers (category_id, value, clues_count)
+select category_id, value, count(*)
+from clues
+where value is not null
+group by category_id, value
+on conflict (category_id, value) do update set clues_count = excluded.clues_count;
+
+create type clue_stats_delta as (category_id bigint, value integer, clues integer, valid integer);
+
+-- Apply signed per-clue contributions to the category statistics
+create or replace function apply_clue_stats(deltas clue_stats_delta[])
+returns void
+language plpgsql
+as $$
+begin
+    update categories c
+    set clues_count = c.clues_count + d.clues,
+        valid_clues_count = c.valid_clues_count + d.valid
+    from (
+        select category_id, sum(clues) as clues, sum(valid) as valid
+        from unnest(deltas)
+        group by category_id
+        having sum(clues) <> 0 or sum(valid) <> 0
+    ) d
+    where c.id = d.category_id;
+
+    insert into category_value_tiers as t (category_id, value, clues_count)
+    select category_id, value, sum(clues)
+    from unnest(deltas)
+    where value is not null
+    group by category_id, value
+    having sum(clues) <> 0
+    on conflict (category_id, value) do update set clues_count = t.clues_count + excluded.clues_count;
+
+    delete from category_value_tiers t
+    using (select distinct category_id, value from unnest(deltas) where value is not null) d
+    where t.category_id = d.category_id and t.value = d.value and t.clues_count <= 0;
+end;
+$$;
+
+create or replace function clues_stats_trigger()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP = 'INSERT' then
+        perform apply_clue_stats(array(
+            select (category_id, value, 1, (coalesce(invalid_count, 0) = 0)::integer)::clue_stats_delta
+            from new_rows
+        ));
+    elsif TG_OP = 'DELETE' then
+        perform apply_clue_stats(array(
+            select (category_id, value, -1, -(coalesce(invalid_count, 0) = 0)::integer)::clue_stats_delta
+            from old_rows
+        ));
+    else
+        perform apply_clue_stats(array(
+            select (category_id, value, 1, (coalesce(invalid_count, 0) = 0)::integer)::clue_stats_delta
+            from new_rows
+            union all
+            select (category_id, value, -1, -(coalesce(invalid_count, 0) = 0)::integer)::clue_stats_delta
+            from old_rows
+        ));
+    end if;
+    return null;
+end;
+$$;
+
+-- A trigger with transition tables can only fire on one event
+drop trigger if exists clues_stats_insert on clues;
+create trigger clues_stats_insert
+    after insert on clues
+    referencing new table as new_rows
+    for each statement execute function clues_stats_trigger();
+
+drop trigger if exists clues_stats_update on clues;
+create trigger clues_stats_update
+    after update on clues
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function clues_stats_trigger();
+
+drop trigger if exists clues_stats_delete on clues;
+create trigger clues_stats_delete
+    after delete on clues
+    referencing old table as old_rows
+    for each statement execute function clues_stats_trigger();
+
+-- The statistics belong to the triggers: a category written directly (a
+-- loader upserting a stale clues_count) starts at zero or keeps its counts.
+-- Writes made from inside the clue triggers run at trigger depth > 1.
+create or replace function categories_keep_stats()
+returns trigger
+language plpgsql
+as $$
+begin
+    if pg_trigger_depth() = 1 then
+        if TG_OP = 'INSERT' then
+            new.clues_count := 0;
+            new.valid_clues_count := 0;
+        else
+            new.clues_count := old.clues_count;
+            new.valid_clues_count := old.valid_clues_count;
+        end if;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists categories_keep_stats on categories;
+create trigger categories_keep_stats
+    before insert or update on categories
+    for each row execute function categories_keep_stats();
+
+-- deploy/api.py now picks categories with enough valid clues
+drop index if exists idx_categories_eligible;
+create index if not exists idx_categories_eligible on categories (id) where valid_clues_count >= 4;
@@ -0,0 +1,9 @@
+-- deploy/migrate.py used to load Final Jeopardy clues with value 0, but
+-- random_clues(final_only) and the final board round look for value is null.
+-- Those finals are the only clues whose category is their own id, numbered
+-- from 1000000.
+update clues
+set value = null
+where value = 0
+  and category_id >= 1000000
+  and category_id = id;
@@ -0,0 +1,96 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Orders a cursor can seek on; every order ends in id so positions are unique
+SORT_KEYS = {
+    "id": ("id",),
+    "airdate": ("airdate", "id"),
+}
+
+# A decoded cursor: the sort key name and the last row's values for that key
+Position = Tuple[str, Optional[Tuple[Any, ...]]]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, row: Dict[str, Any]) -> str:
+    """Build an opaque cursor pointing just past `row`."""
+    payload = json.dumps([sort, *(row[column] for column in SORT_KEYS[sort])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str = "id") -> Position:
+    """Decode a cursor; "start" (or an empty cursor) begins at the first row in `sort` order."""
+    if cursor in ("", "start"):
+        return sort, None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort, *values = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+    if sort not in SORT_KEYS or len(values) != len(SORT_KEYS[sort]) or not valid_position(sort, values):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+    return sort, tuple(values)
+
+
+def valid_position(sort: str, values: List[Any]) -> bool:
+    *keys, last_id = values
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        return False
+    if sort == "airdate":
+        # A null airdate is a real position: the last row of the page had none
+        airdate = keys[0]
+        if airdate is None:
+            return True
+        try:
+            datetime.fromisoformat(airdate.strip())
+        except (AttributeError, ValueError):
+            return False
+    return True
+
+
+def order_param(sort: str) -> str:
+    return ",".join(f"{column}.asc" for column in SORT_KEYS[sort])
+
+
+def seek_filters(position: Position) -> List[Tuple[str, str]]:
+    """PostgREST filters selecting the rows after a cursor position."""
+    sort, values = position
+    if values is None:
+        return []
+    if sort == "id":
+        return [("id", f"gt.{values[0]}")]
+    airdate, last_id = values
+    if airdate is None:
+        # Postgres sorts nulls last, so only undated rows with a higher id follow
+        return [("airdate", "is.null"), ("id", f"gt.{last_id}")]
+    # The redundant gte bound lets Postgres seek the (airdate, id) index instead of walking it
+    return [
+        ("airdate", f'gte."{airdate}"'),
+        ("or", f'(airdate.gt."{airdate}",and(airdate.eq."{airdate}",id.gt.{last_id}))')
+    ]
+
+
+def trailing_filters(position: Position) -> Optional[List[Tuple[str, str]]]:
+    """Filters for the rows that follow once those seek_filters selects run out, if any.
+
+    Postgres sorts null airdates after every date, so an airdate walk past
+    its last dated row goes on with the undated ones. They are a separate
+    query so that both halves seek the (airdate, id) index.
+    """
+    sort, values = position
+    if sort == "airdate" and values is not None and values[0] is not None:
+        return [("airdate", "is.null")]
+    return None
+
+
+def next_cursor(sort: str, rows: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    """Cursor for the following page, or None once a short page says we're done."""
+    if len(rows) < limit:
+        return None
+    return encode_cursor(sort, rows[-1])
@@ -0,0 +1,64 @@
+import os
+import logging
+import time
+from supabase import create_client, Client
+from dotenv import load_dotenv
+from clue_cleaning import clean_clue_text
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Initialize Supabase client
+supabase_url = os.getenv("SUPABASE_URL")
+supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
+supabase: Client = create_client(supabase_url, supabase_key)
+
+def reclean_clues(batch_size: int = 1000):
+    """Recompute clean_question/clean_answer for every clue after the cleaning rules change."""
+    last_id = 0
+    scanned = 0
+    updated = 0
+
+    while True:
+        response = supabase.table("clues") \
+            .select("id, question, answer, clean_question, clean_answer") \
+            .gt("id", last_id) \
+            .order("id") \
+            .limit(batch_size) \
+            .execute()
+        rows = response.data
+        if not rows:
+            break
+
+        # Only send the rows whose cleaned text actually changes
+        ids, questions, answers = [], [], []
+        for row in rows:
+            clean_question, clean_answer = clean_clue_text(row["question"], row["answer"])
+            if clean_question != row["clean_question"] or clean_answer != row["clean_answer"]:
+                ids.append(row["id"])
+                questions.append(clean_question)
+                answers.append(clean_answer)
+
+        if ids:
+            supabase.rpc("set_clean_text", {
+                "clue_ids": ids,
+                "questions": questions,
+                "answers": answers
+            }).execute()
+            updated += len(ids)
+
+        scanned += len(rows)
+        last_id = rows[-1]["id"]
+        logger.info(f"Scanned {scanned} clues, updated {updated}")
+
+        # Add a small delay between batches to prevent rate limiting
+        time.sleep(0.2)
+
+    logger.info(f"Recleaning complete: updated {updated} of {scanned} clues")
+
+if __name__ == "__main__":
+    reclean_clues()
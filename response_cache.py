@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from json_encoding import encode
+from metrics import CACHE_LOOKUPS
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    expires: float
+
+
+def cache_key(route: str, **params) -> str:
+    """Normalize a route and its parsed query parameters into a cache key."""
+    items = sorted((name, str(value)) for name, value in params.items() if value is not None)
+    return f"{route}?{urlencode(items)}"
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check If-None-Match, which compares validators weakly."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ResponseCache:
+    """LRU cache of encoded JSON bodies, bounded by total size and entry age."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, max_age: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.cache_control = f"public, max-age={max_age}"
+        self.size = 0
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def get(self, key: str) -> Optional[CachedBody]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, body: bytes) -> CachedBody:
+        entry = CachedBody(body, make_etag(body), time.monotonic() + self.ttl_seconds)
+        if key in self._entries:
+            self._remove(key)
+        # Bodies larger than the whole budget are served but never stored
+        if len(body) <= self.max_bytes:
+            self._entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.size -= len(entry.body)
+
+    async def respond(
+        self,
+        request: Request,
+        key: str,
+        produce: Callable[[], Awaitable[Any]],
+        cache_control: Optional[str] = None
+    ) -> Response:
+        """Serve `key` from the cache, computing it with `produce` on a miss.
+
+        Concurrent misses on the same key share a single `produce` call.
+        `cache_control` overrides the default Cache-Control header.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            CACHE_LOOKUPS.inc("response", "hit")
+        else:
+            pending = self._inflight.get(key)
+            if pending is not None:
+                CACHE_LOOKUPS.inc("response", "shared")
+                entry = await asyncio.shield(pending)
+            else:
+                CACHE_LOOKUPS.inc("response", "miss")
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                try:
+                    data = await produce()
+                    entry = self.put(key, encode(data))
+                except Exception as e:
+                    future.set_exception(e)
+                    # Nobody else may be waiting; don't warn about an unretrieved exception
+                    future.exception()
+                    raise
+                except BaseException:
+                    future.cancel()
+                    raise
+                else:
+                    future.set_result(entry)
+                finally:
+                    del self._inflight[key]
+
+        headers = {"ETag": entry.etag, "Cache-Control": cache_control or self.cache_control}
+        if etag_matches(request, entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine, text
+from pathlib import Path
+import os
+from dotenv import load_dotenv
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+def pending_migrations(connection):
+    """Migration files not yet recorded in schema_migrations, in version order."""
+    connection.execute(text(
+        "create table if not exists schema_migrations ("
+        " version text primary key,"
+        " applied_at timestamp with time zone default now() not null)"
+    ))
+    applied = set(connection.execute(text("select version from schema_migrations")).scalars())
+    return [path for path in sorted(MIGRATIONS_DIR.glob("*.sql")) if path.stem not in applied]
+
+def run_migrations(engine):
+    """Apply each pending migration in its own transaction."""
+    with engine.begin() as connection:
+        migrations = pending_migrations(connection)
+
+    for path in migrations:
+        logger.info(f"Applying migration {path.stem}...")
+        with engine.begin() as connection:
+            connection.exec_driver_sql(path.read_text())
+            connection.execute(text("insert into schema_migrations (version) values (:version)"), {"version": path.stem})
+
+    logger.info(f"Database is up to date ({len(migrations)} migrations applied)")
+
+if __name__ == "__main__":
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable is not set")
+    run_migrations(create_engine(database_url))
@@ -0,0 +1,171 @@
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from clue_cleaning import TAG_PATTERN
+from clue_table import LABEL, NULL_REF, TEXT, StringHeap
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    "a an and are as at by for from he her his in is it its of on or she that the this to was with".split()
+)
+
+# Category titles count double: a title match says more about a clue than a word in its text
+TITLE_WEIGHT = 2
+
+# The arrays a SearchIndex is made of, in the order a snapshot file stores them
+SEARCH_ARRAYS = ("term_data", "term_offsets", "posting_offsets", "postings", "frequencies", "lengths")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, ASCII-folded word tokens with markup and apostrophes removed."""
+    if not text:
+        return []
+    text = TAG_PATTERN.sub(" ", text)
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return TOKEN_PATTERN.findall(text.lower().replace("'", ""))
+
+
+def query_terms(query: str) -> List[str]:
+    terms = list(dict.fromkeys(tokenize(query)))
+    # A query made only of stop words still searches for them
+    return [term for term in terms if term not in STOP_WORDS] or terms
+
+
+class SearchIndex:
+    """Inverted index over clue text and category titles of a ClueTable.
+
+    Each term maps to a postings list of clue rows (ascending) with a
+    parallel list of weighted term frequencies. Queries match clues that
+    contain every term and rank them with BM25.
+
+    Terms are sorted in a string heap and found with bisect; the postings
+    of term `i` are `postings[posting_offsets[i]:posting_offsets[i + 1]]`.
+    These flat arrays (SEARCH_ARRAYS) can be stored in and mapped from a
+    snapshot file.
+    """
+
+    def __init__(self, arrays: Dict[str, Sequence[int]]):
+        for name in SEARCH_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.terms = StringHeap(self.term_data, self.term_offsets)
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    @classmethod
+    def build(cls, table) -> "SearchIndex":
+        clues = table.clues
+        postings: Dict[str, array] = {}
+        frequencies: Dict[str, array] = {}
+        lengths = array("H")
+        title_tokens: Dict[int, List[str]] = {}
+
+        category_ids = clues.columns["category_id"]
+        clean_questions = clues.columns["clean_question"]
+        for row in range(len(clues)):
+            counts = Counter()
+            # Prefer the text cleaned at ingestion, fall back to the raw columns
+            names = ("clean_question", "clean_answer") if clean_questions[row] != NULL_REF else ("question", "answer")
+            for name in names:
+                counts.update(tokenize(clues.value(row, name, TEXT)))
+
+            category_id = category_ids[row]
+            if category_id not in title_tokens:
+                category_row = table.find_category(category_id)
+                title = table.categories.value(category_row, "title", LABEL) if category_row is not None else None
+                title_tokens[category_id] = tokenize(title)
+            for token in title_tokens[category_id]:
+                counts[token] += TITLE_WEIGHT
+
+            lengths.append(min(sum(counts.values()), 65535))
+            for token, count in counts.items():
+                rows = postings.get(token)
+                if rows is None:
+                    rows = postings[token] = array("i")
+                    frequencies[token] = array("B")
+                rows.append(row)
+                frequencies[token].append(min(count, 255))
+
+        terms = StringHeap()
+        posting_offsets, all_postings, all_frequencies = array("q", [0]), array("i"), array("B")
+        for term in sorted(postings):
+            terms.add(term)
+            all_postings.extend(postings.pop(term))
+            all_frequencies.extend(frequencies.pop(term))
+            posting_offsets.append(len(all_postings))
+        return cls({
+            "term_data": terms.data,
+            "term_offsets": terms.offsets,
+            "posting_offsets": posting_offsets,
+            "postings": all_postings,
+            "frequencies": all_frequencies,
+            "lengths": lengths,
+        })
+
+    def arrays(self) -> Dict[str, Sequence[int]]:
+        return {name: getattr(self, name) for name in SEARCH_ARRAYS}
+
+    def term_postings(self, term: str) -> Optional[Tuple[Sequence[int], Sequence[int]]]:
+        """The rows containing `term` and their frequencies, or None for an unknown term."""
+        position = bisect.bisect_left(range(len(self.terms)), term, key=self.terms.get)
+        if position == len(self.terms) or self.terms.get(position) != term:
+            return None
+        start, end = self.posting_offsets[position], self.posting_offsets[position + 1]
+        return self.postings[start:end], self.frequencies[start:end]
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        offset: int = 0,
+        accept: Optional[Callable[[int], bool]] = None,
+        row_ids: Optional[array] = None
+    ) -> List[Tuple[float, int]]:
+        """Return (score, row) pairs for the best matches, best first.
+
+        `accept` filters candidate rows; `row_ids` breaks score ties by id.
+        """
+        found = [self.term_postings(term) for term in query_terms(query)]
+        if not found or None in found:
+            return []
+
+        # Start from the rarest term so the candidate set is as small as possible
+        found.sort(key=lambda postings: len(postings[0]))
+        scores: Dict[int, float] = {}
+        for position, (rows, frequencies) in enumerate(found):
+            weight = self.idf(len(rows))
+            next_scores: Dict[int, float] = {}
+            for index, row in enumerate(rows):
+                if position == 0:
+                    if accept is not None and not accept(row):
+                        continue
+                    score = 0.0
+                else:
+                    score = scores.get(row)
+                    if score is None:
+                        continue
+                next_scores[row] = score + weight * self.term_score(frequencies[index], self.lengths[row])
+            scores = next_scores
+            if not scores:
+                return []
+
+        tie_break = row_ids.__getitem__ if row_ids is not None else (lambda row: row)
+        best = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], -tie_break(item[0])))
+        return [(score, row) for row, score in best[offset:]]
+
+    def idf(self, document_frequency: int) -> float:
+        total = len(self.lengths)
+        return math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def term_score(self, frequency: int, length: int) -> float:
+        norm = 1 - B + B * (length / self.average_length if self.average_length else 1)
+        return frequency * (K1 + 1) / (frequency + K1 * norm)
@@ -0,0 +1,31 @@
+import hashlib
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+
+def resolve_seed(seed: Optional[str], daily: bool, now: Optional[datetime] = None) -> Optional[str]:
+    """The seed a request samples with: the UTC date in daily mode, else `seed` (None = unseeded)."""
+    if daily:
+        now = now or datetime.now(timezone.utc)
+        return f"daily:{now.date().isoformat()}"
+    return seed
+
+
+def seeded_random(seed: str, scope: str) -> random.Random:
+    """A generator that yields the same sequence for the same seed and scope in every process.
+
+    The scope keeps /api/random and /api/final from picking related rows for a shared seed.
+    """
+    digest = hashlib.sha256(f"{scope}:{seed}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def seed_cache_control(daily: bool, max_age: int, now: Optional[datetime] = None) -> str:
+    """Cache-Control for a seeded response; daily ones expire at the next UTC midnight."""
+    if daily:
+        now = now or datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+        max_age = min(max_age, max(1, int((midnight - now).total_seconds())))
+    # s-maxage lets a shared cache or CDN serve every player the same response
+    return f"public, max-age={max_age}, s-maxage={max_age}"
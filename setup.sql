@@ -38,4 +38,90 @@ create policy "Public can read clues"
 
 -- Create indexes for better performance
 create index if not exists idx_clues_category_id on clues(category_id);
-create index if not exists idx_categories_title on categories(title); 
\ No newline at end of file
+create index if not exists idx_categories_title on categories(title); 
+
+-- Sample clues uniformly at random without scanning the table.
+-- Random ids are probed between min(id) and max(id); both bounds and every
+-- probe are primary key lookups, so the cost grows with the sample size
+-- rather than the table size. Probes that land in id gaps (or on non-final
+-- clues when final_only is set) are rejected and retried with more probes,
+-- which keeps the sample uniform over the matching clues.
+-- Rows are returned as json shaped like PostgREST's `*, categories(*)`.
+create or replace function random_clues(sample_size integer default 1, final_only boolean default false)
+returns setof jsonb
+language plpgsql
+volatile
+as $$
+declare
+    min_id bigint;
+    max_id bigint;
+    picked bigint[] := '{}';
+    missing integer;
+    oversample integer := case when final_only then 64 else 2 end;
+    attempts integer := 0;
+begin
+    select min(id), max(id) into min_id, max_id from clues;
+    if min_id is null then
+        return;
+    end if;
+
+    loop
+        missing := sample_size - cardinality(picked);
+        exit when missing <= 0 or attempts >= 12;
+        attempts := attempts + 1;
+
+        picked := picked || array(
+            select c.id
+            from (
+                select distinct min_id + floor(random() * (max_id - min_id + 1))::bigint as id
+                from generate_series(1, missing * oversample)
+            ) probe
+            join clues c on c.id = probe.id
+            where (not final_only or c.value is null)
+              and c.id <> all(picked)
+            order by random()
+            limit missing
+        );
+        oversample := oversample * 2;
+    end loop;
+
+    return query
+        select to_jsonb(c) || jsonb_build_object('categories', to_jsonb(cat))
+        from clues c
+        join categories cat on cat.id = c.category_id
+        where c.id = any(picked);
+end;
+$$;
+
+
+-- Apply a batch of coalesced invalid-clue reports in one statement.
+-- The increment happens in the UPDATE itself, so concurrent batches
+-- never lose counts the way a read-then-write would.
+create or replace function increment_invalid_counts(clue_ids bigint[], deltas integer[])
+returns void
+language sql
+volatile
+as $$
+    update clues c
+    set invalid_count = coalesce(c.invalid_count, 0) + d.delta
+    from unnest(clue_ids, deltas) as d(id, delta)
+    where c.id = d.id;
+$$;
+
+
+-- Clue text with markup stripped, filled in by the ingestion tools
+alter table clues add column if not exists clean_question text;
+alter table clues add column if not exists clean_answer text;
+
+-- Rewrite the cleaned text of a batch of clues in one statement (used by reclean_clues.py)
+create or replace function set_clean_text(clue_ids bigint[], questions text[], answers text[])
+returns void
+language sql
+volatile
+as $$
+    update clues c
+    set clean_question = d.question,
+        clean_answer = d.answer
+    from unnest(clue_ids, questions, answers) as d(id, question, answer)
+    where c.id = d.id;
+$$;
@@ -0,0 +1,298 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import math
+import random
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from clue_table import NULLS_LAST_DAY, ClueTable, ClueTableBuilder, airdate_order, airdate_sort_day, build_clue_table, to_epoch_day
+from filter_index import FilterIndex, bitmap_contains, bitmap_rows
+from json_encoding import RawJSON
+from pagination import Position
+from search_index import SearchIndex
+from snapshot_file import SnapshotFile
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# PostgREST caps every response at 1000 rows by default
+PAGE_SIZE = 1000
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO timestamp or date the way Postgres would cast it to timestamptz."""
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def fetch_all_rows(upstream, table: str, consume: Callable[[List[Dict[str, Any]]], None]) -> int:
+    """Page through a whole table in id order, handing each page to `consume`."""
+    count = 0
+    filters = []
+    while True:
+        page = await upstream.select(table, "*", filters, order="id", limit=PAGE_SIZE)
+        consume(page)
+        count += len(page)
+        if len(page) < PAGE_SIZE:
+            return count
+        filters = [("id", f"gt.{page[-1]['id']}")]
+
+
+async def load_table(upstream) -> ClueTable:
+    """Download both tables from Supabase straight into a compact table."""
+    builder = ClueTableBuilder()
+    category_count, clue_count = await asyncio.gather(
+        fetch_all_rows(upstream, "categories", builder.add_categories),
+        fetch_all_rows(upstream, "clues", builder.add_clues)
+    )
+    # Sorting hundreds of thousands of rows is CPU-bound, keep it off the event loop
+    table = await asyncio.to_thread(builder.build)
+    logger.info(f"Loaded {category_count} categories and {clue_count} clues ({table.nbytes() / 1e6:.1f} MB)")
+    return table
+
+
+def day_bounds(min_date: Optional[str], max_date: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Translate an airdate range into inclusive epoch-day bounds."""
+    low = math.ceil(parse_timestamp(min_date).timestamp() / 86400) if min_date else None
+    high = math.floor(parse_timestamp(max_date).timestamp() / 86400) if max_date else None
+    return low, high
+
+
+class ClueSnapshot:
+    """Immutable in-memory copy of the categories and clues tables."""
+
+    def __init__(
+        self,
+        table: ClueTable,
+        with_search: bool = False,
+        by_airdate: Optional[Sequence[int]] = None,
+        filters: Optional[FilterIndex] = None,
+        search_index: Optional[SearchIndex] = None
+    ):
+        """Index `table`, reusing whatever indexes were mapped along with it."""
+        self.table = table
+        self.airdays = table.clues.columns["airdate"]
+        self.by_airdate = airdate_order(table) if by_airdate is None else by_airdate
+        self.filters = FilterIndex(table, self.by_airdate) if filters is None else filters
+        if search_index is None and with_search:
+            search_index = SearchIndex.build(table)
+        self.search_index = search_index
+        self.loaded_at = datetime.now(timezone.utc)
+
+    @classmethod
+    def from_rows(cls, categories: List[Dict[str, Any]], clues: List[Dict[str, Any]], with_search: bool = False) -> "ClueSnapshot":
+        return cls(build_clue_table(categories, clues), with_search)
+
+    @classmethod
+    async def load(cls, upstream, with_search: bool = False) -> "ClueSnapshot":
+        """Download both tables from Supabase and index them."""
+        table = await load_table(upstream)
+        # Indexing is CPU-bound too
+        return await asyncio.to_thread(cls, table, with_search)
+
+    @classmethod
+    def from_file(cls, snapshot_file: SnapshotFile) -> Optional["ClueSnapshot"]:
+        """Map a prebuilt snapshot file; a search index missing from it is left to build_search_index."""
+        mapped = snapshot_file.open()
+        if mapped is None:
+            return None
+        snapshot = cls(mapped.table, False, mapped.by_airdate, mapped.filters, mapped.search_index)
+        snapshot.loaded_at = datetime.fromtimestamp(mapped.built_at, timezone.utc)
+        return snapshot
+
+    def build_search_index(self):
+        # Assigned only once complete, so /api/search answers 503 until then
+        self.search_index = SearchIndex.build(self.table)
+
+    def airdate_key(self, row: int) -> Tuple[int, int]:
+        return airdate_sort_day(self.airdays[row]), self.table.clue_ids[row]
+
+    def has_clue(self, clue_id: int) -> bool:
+        return self.table.find_clue(clue_id) is not None
+
+    def random_clues(self, count: int, rng: Optional[random.Random] = None) -> List[RawJSON]:
+        """Sample clues; a seeded `rng` picks the same clues for the same corpus."""
+        rows = (rng or random).sample(range(len(self.table)), min(count, len(self.table)))
+        return [self.table.clue_json(row) for row in rows]
+
+    def final_clues(self, count: int, rng: Optional[random.Random] = None) -> List[RawJSON]:
+        finals = self.table.finals
+        return [self.table.clue_json(row) for row in (rng or random).sample(finals, min(count, len(finals)))]
+
+    def filter_rows(
+        self,
+        value: Optional[int] = None,
+        min_date: Optional[str] = None,
+        max_date: Optional[str] = None,
+        game_id: Optional[int] = None,
+        category: Optional[int] = None,
+        offset: int = 0,
+        limit: int = 100,
+        position: Optional[Position] = None
+    ) -> List[int]:
+        """Apply the /api/clues filters and return the clue rows of one page.
+
+        Pages are in id order, or in the cursor's order starting after its
+        position when `position` is given.
+        """
+        low, high = day_bounds(min_date, max_date)
+        match = self.filters.match(value, low, high, game_id, category)
+        sort, after = position or ("id", None)
+        table = self.table
+
+        if sort == "airdate":
+            accept = None
+            if match is None or isinstance(match, bytes):
+                # Walk the airdate order, only within the date bounds
+                candidates = self.by_airdate
+                start, end = self.filters.airdate_span(low, high)
+                if match is not None:
+                    accept = lambda row: bitmap_contains(match, row)
+            else:
+                candidates = sorted(match, key=self.airdate_key)
+                start, end = 0, len(candidates)
+            if after is not None:
+                # Clues without an airdate sort last, as Postgres has them, and so do cursors left on one
+                after_day = NULLS_LAST_DAY if after[0] is None else to_epoch_day(after[0])
+                start = max(start, bisect.bisect_right(candidates, (after_day, after[1]), key=self.airdate_key))
+            rows = (candidates[index] for index in range(start, end))
+            if accept is not None:
+                rows = filter(accept, rows)
+        else:
+            # Rows are in id order, so the row after the cursor is found by bisecting the ids
+            start = bisect.bisect_right(table.clue_ids, after[0]) if after is not None else 0
+            if match is None:
+                rows = range(start, len(table))
+            elif isinstance(match, bytes):
+                rows = bitmap_rows(match, start)
+            else:
+                rows = match[bisect.bisect_left(match, start):]
+        return list(itertools.islice(rows, offset, offset + limit))
+
+    def search(
+        self,
+        query: str,
+        value: Optional[int] = None,
+        min_date: Optional[str] = None,
+        max_date: Optional[str] = None,
+        game_id: Optional[int] = None,
+        category: Optional[int] = None,
+        offset: int = 0,
+        limit: int = 25
+    ) -> List[RawJSON]:
+        """Rank clues matching every word of `query`, with the /api/clues filters applied."""
+        low, high = day_bounds(min_date, max_date)
+        match = self.filters.match(value, low, high, game_id, category)
+        if match is None:
+            accept = None
+        elif isinstance(match, bytes):
+            accept = lambda row: bitmap_contains(match, row)
+        else:
+            accept = set(match).__contains__
+        results = self.search_index.search(query, limit, offset, accept, self.table.clue_ids)
+        return [self.table.clue_json(row) for _, row in results]
+
+    def category_rows(self, offset: int, count: int, after_id: Optional[int] = None) -> range:
+        if after_id is not None:
+            offset += bisect.bisect_right(self.table.category_ids, after_id)
+        return range(offset, min(offset + count, len(self.table.categories)))
+
+    def category_with_clues(self, category_id: int) -> Optional[Dict[str, Any]]:
+        """Shape a category like `*, clues(*)` with clue timestamps removed."""
+        row = self.table.find_category(category_id)
+        if row is None:
+            return None
+        return self.table.category_with_clues(row)
+
+
+class SnapshotStore:
+    """Holds the current snapshot and refreshes it in the background."""
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[ClueSnapshot]],
+        refresh_seconds: float,
+        on_refresh: Optional[Callable[[], None]] = None
+    ):
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self.on_refresh = on_refresh
+        self.current: Optional[ClueSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Load a new snapshot and swap it in."""
+        snapshot = await self.loader()
+        if snapshot is self.current:
+            return
+        # A single attribute assignment, so readers never see a half-built snapshot
+        self.current = snapshot
+        if self.on_refresh:
+            self.on_refresh()
+
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Initial snapshot load failed, serving from Supabase: {str(e)}")
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Snapshot refresh failed, keeping previous snapshot: {str(e)}")
+
+
+class SharedSnapshotLoader:
+    """Loads snapshots through a file mapped by every worker on the host.
+
+    Under the file's lock, a worker that finds it missing or older than
+    `max_age` downloads the corpus and writes a new version; the others wait
+    for the lock and map what it wrote, so a refresh costs one upstream
+    reload however many workers there are. The filter index, and the search
+    index when `with_search` is set, are written into the file too, so
+    workers map them instead of building their own copies.
+    """
+
+    def __init__(self, snapshot_file: SnapshotFile, upstream, max_age: float, with_search: bool = False):
+        self.snapshot_file = snapshot_file
+        self.upstream = upstream
+        self.max_age = max_age
+        self.with_search = with_search
+        self.snapshot: Optional[ClueSnapshot] = None
+        self.identity: Optional[Tuple[int, int]] = None
+
+    async def __call__(self) -> ClueSnapshot:
+        async with self.snapshot_file.locked():
+            mapped = self.snapshot_file.open(self.max_age)
+            if mapped is None:
+                table = await load_table(self.upstream)
+                by_airdate = await asyncio.to_thread(airdate_order, table)
+                search_index = await asyncio.to_thread(SearchIndex.build, table) if self.with_search else None
+                await asyncio.to_thread(self.snapshot_file.write, table, by_airdate, None, search_index)
+                mapped = self.snapshot_file.open()
+
+        # Another worker's refresh may already be the one we are holding
+        if self.snapshot is not None and mapped.identity == self.identity:
+            return self.snapshot
+        # Only a file written without a search index (e.g. by an export tool) leaves one to build here
+        snapshot = await asyncio.to_thread(
+            ClueSnapshot, mapped.table, self.with_search, mapped.by_airdate, mapped.filters, mapped.search_index
+        )
+        snapshot.loaded_at = datetime.fromtimestamp(mapped.built_at, timezone.utc)
+        self.snapshot, self.identity = snapshot, mapped.identity
+        logger.info(f"Attached to snapshot file {self.snapshot_file.path} built at {snapshot.loaded_at.isoformat()}")
+        return snapshot
@@ -0,0 +1,213 @@
+import asyncio
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from clue_table import (
+    CATEGORY_COLUMNS, CLUE_COLUMNS, ClueTable, ColumnTable, StringHeap, airdate_order, table_from_categories
+)
+from filter_index import FILTER_ARRAYS, FilterIndex
+from search_index import SEARCH_ARRAYS, SearchIndex
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b"JSNAP\x00\x00\x01"
+# 2: category_offsets, the category -> clues offset table
+# 3: the filter index, and optionally the search index
+# 4: clean text that matches clean_clue_text is derived on read, not stored
+# 5: clues without an airdate sort last in by_airdate
+FORMAT_VERSION = 5
+
+# Every section starts on this boundary so it can be cast in place
+ALIGNMENT = 8
+
+# How often a worker waiting for another one to finish a snapshot checks the lock
+LOCK_POLL_SECONDS = 0.1
+
+
+class MappedSnapshot(NamedTuple):
+    table: ClueTable
+    by_airdate: Sequence[int]
+    filters: FilterIndex
+    search_index: Optional[SearchIndex]     # None when the file was written without one
+    built_at: float
+    identity: Tuple[int, int]   # (inode, mtime_ns) of the file it was mapped from
+
+
+def schema_manifest() -> Dict[str, List[List[str]]]:
+    return {
+        "categories": [list(column) for column in CATEGORY_COLUMNS],
+        "clues": [list(column) for column in CLUE_COLUMNS],
+    }
+
+
+def padding(offset: int) -> bytes:
+    return b"\x00" * (-offset % ALIGNMENT)
+
+
+class SnapshotFile:
+    """A ClueTable laid out as one file that any number of processes can mmap.
+
+    The file is a header (magic, then the length of a JSON manifest), the
+    manifest naming each section's offset, length and array typecode, and
+    the sections themselves: the string heap, every column, the derived
+    orderings and category -> clues offsets, the filter index and, when
+    one is written, the search index. Mapped snapshots read all of them
+    straight out of the page cache through memoryviews, so N workers on a
+    tmpfs path such as /dev/shm share one copy instead of building their
+    own; only per-process caches (encoded rows, responses) are private.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+
+    @asynccontextmanager
+    async def locked(self):
+        """Hold the host-wide lock that serializes rebuilding the file."""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    # Polled rather than blocking in a thread, so a cancelled refresh lets go at once
+                    await asyncio.sleep(LOCK_POLL_SECONDS)
+            yield
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+    def write(
+        self,
+        table: ClueTable,
+        by_airdate: Optional[Sequence[int]] = None,
+        filters: Optional[FilterIndex] = None,
+        search_index: Optional[SearchIndex] = None
+    ):
+        """Write a new version next to the current one and rename it into place.
+
+        The filter index is built if not given; the search index is only
+        stored when given.
+        """
+        if by_airdate is None:
+            by_airdate = airdate_order(table)
+        if filters is None:
+            filters = FilterIndex(table, by_airdate)
+        sections: List[Tuple[str, Any]] = [
+            ("heap.data", table.heap.data),
+            ("heap.offsets", table.heap.offsets),
+            ("category_order", table.category_order),
+            ("category_offsets", table.category_offsets),
+            ("finals", table.finals),
+            ("by_airdate", by_airdate),
+        ]
+        sections += [(f"categories.{name}", column) for name, column in table.categories.columns.items()]
+        sections += [(f"clues.{name}", column) for name, column in table.clues.columns.items()]
+        sections += [(f"filters.{name}", data) for name, data in filters.arrays().items()]
+        if search_index is not None:
+            sections += [(f"search.{name}", data) for name, data in search_index.arrays().items()]
+
+        # Offsets are relative to the end of the header so the manifest can describe them up front
+        layout: Dict[str, List[Any]] = {}
+        offset = 0
+        for name, data in sections:
+            view = memoryview(data)
+            layout[name] = [offset, view.nbytes, view.format]
+            offset += view.nbytes + len(padding(view.nbytes))
+        manifest = json.dumps({
+            "version": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "built_at": time.time(),
+            "schema": schema_manifest(),
+            "sections": layout,
+        }).encode("utf-8")
+        header = MAGIC + struct.pack("<Q", len(manifest)) + manifest
+        header += padding(len(header))
+
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(header)
+                for _, data in sections:
+                    view = memoryview(data)
+                    f.write(view)
+                    f.write(padding(view.nbytes))
+                f.flush()
+                os.fsync(f.fileno())
+            # Workers still mapping the previous file keep it alive until they let go
+            os.replace(temporary, self.path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        logger.info(f"Wrote snapshot file {self.path} ({(len(header) + offset) / 1e6:.1f} MB)")
+
+    def open(self, max_age: Optional[float] = None) -> Optional[MappedSnapshot]:
+        """Map the current file, or None if it is missing, older than `max_age` or from another version."""
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size == 0:
+                    return None
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+
+        buffer = memoryview(mapping)
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            logger.warning(f"{self.path} is not a snapshot file, ignoring it")
+            return None
+        (manifest_length,) = struct.unpack_from("<Q", buffer, len(MAGIC))
+        start = len(MAGIC) + 8
+        manifest = json.loads(bytes(buffer[start:start + manifest_length]))
+        if (
+            manifest["version"] != FORMAT_VERSION
+            or manifest["byteorder"] != sys.byteorder
+            or manifest["schema"] != schema_manifest()
+        ):
+            logger.info(f"{self.path} was written by a different version, it will be rebuilt")
+            return None
+        if max_age is not None and time.time() - manifest["built_at"] >= max_age:
+            return None
+
+        base = start + manifest_length
+        base += len(padding(base))
+
+        def section(name: str) -> memoryview:
+            offset, length, typecode = manifest["sections"][name]
+            return buffer[base + offset:base + offset + length].cast(typecode)
+
+        heap = StringHeap(section("heap.data"), section("heap.offsets"))
+        categories = ColumnTable(CATEGORY_COLUMNS, heap, {
+            name: section(f"categories.{name}") for name, _ in CATEGORY_COLUMNS
+        })
+        clues = ColumnTable(CLUE_COLUMNS, heap, {
+            name: section(f"clues.{name}") for name, _ in CLUE_COLUMNS
+        })
+        table = ClueTable(
+            heap, categories, clues, section("category_order"), section("category_offsets"), section("finals")
+        )
+        by_airdate = section("by_airdate")
+        filters = FilterIndex(table, by_airdate, {name: section(f"filters.{name}") for name in FILTER_ARRAYS})
+        search_index = None
+        if all(f"search.{name}" in manifest["sections"] for name in SEARCH_ARRAYS):
+            search_index = SearchIndex({name: section(f"search.{name}") for name in SEARCH_ARRAYS})
+        return MappedSnapshot(
+            table, by_airdate, filters, search_index, manifest["built_at"], (stat.st_ino, stat.st_mtime_ns)
+        )
+
+
+def write_categories(path: str, categories: Iterable[Dict[str, Any]]):
+    """Write a snapshot file straight from categories with nested clues (the season JSON shape)."""
+    SnapshotFile(path).write(table_from_categories(categories))
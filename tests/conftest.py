@@ -0,0 +1,27 @@
+import importlib
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEPLOY = ROOT / "deploy"
+BENCHMARKS = ROOT / "benchmarks"
+
+sys.path.insert(0, str(ROOT))
+
+
+def import_from(directory: Path, name: str):
+    """Import module `name` from `directory`, the root app or deploy/.
+
+    Both apps have modules with the same names (api, upstream, metrics, ...),
+    so each import gets its own copies and leaves sys.modules as it found it.
+    """
+    local = {path.stem for path in (*ROOT.glob("*.py"), *DEPLOY.glob("*.py"), *BENCHMARKS.glob("*.py"))}
+    saved = {module: sys.modules.pop(module) for module in list(sys.modules) if module in local}
+    sys.path.insert(0, str(directory))
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path.remove(str(directory))
+        for module in local:
+            sys.modules.pop(module, None)
+        sys.modules.update(saved)
@@ -0,0 +1,60 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import BENCHMARKS, ROOT, import_from
+
+
+@pytest.fixture
+def root_api(monkeypatch):
+    """api.py over season data where some clues have no airdate, served by the fake PostgREST server."""
+    monkeypatch.setenv("SUPABASE_URL", "http://fake-postgrest")
+    monkeypatch.setenv("SUPABASE_SERVICE_KEY", "test")
+    monkeypatch.setenv("SNAPSHOT_ENABLED", "false")
+    monkeypatch.setenv("SEARCH_INDEX_ENABLED", "false")
+    monkeypatch.setenv("STARTUP_WARMUP", "false")
+    monkeypatch.delenv("SNAPSHOT_FILE", raising=False)
+    monkeypatch.delenv("SNAPSHOT_SHARED_PATH", raising=False)
+
+    fake_postgrest = import_from(BENCHMARKS, "fake_postgrest")
+    loaded = fake_postgrest.Database.load(ROOT / "json_seasons")
+    clues = [dict(clue, airdate=None) if clue["id"] % 7 == 0 else clue for clue in loaded.tables["clues"]]
+    database = fake_postgrest.Database(loaded.tables["categories"], clues)
+
+    api = import_from(ROOT, "api")
+    api.upstream._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=fake_postgrest.create_app(database)), base_url=api.upstream.base_url
+    )
+    snapshot = api.ClueSnapshot.from_rows(database.tables["categories"], database.tables["clues"])
+    return api, snapshot
+
+
+def walk(client, query: str):
+    """Follow sort=airdate cursors from the start; the clue ids of each page."""
+    pages, cursor = [], "start"
+    while cursor is not None:
+        response = client.get(f"/api/clues?sort=airdate&cursor={cursor}{query}")
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append([clue["id"] for clue in body["data"]])
+        cursor = body["next_cursor"]
+    return pages
+
+
+@pytest.mark.parametrize("query", ["", "&value=200", "&min_date=1985-01-01"])
+def test_snapshot_and_supabase_walk_the_same_pages(root_api, query):
+    api, snapshot = root_api
+    with TestClient(api.app) as client:
+        upstream_pages = walk(client, query)
+        api.response_cache.clear()
+        api.snapshot_store.current = snapshot
+        snapshot_pages = walk(client, query)
+
+    assert snapshot_pages == upstream_pages
+    ids = [clue_id for page in upstream_pages for clue_id in page]
+    assert len(ids) == len(set(ids))
+    if not query:
+        # Every clue is visited, the undated ones last
+        assert len(ids) == len(snapshot.table)
+        undated = [clue_id for clue_id in ids if clue_id % 7 == 0]
+        assert ids[-len(undated):] == undated
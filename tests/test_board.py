@@ -0,0 +1,101 @@
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+
+from conftest import BENCHMARKS, DEPLOY, import_from
+
+CATEGORIES = 8
+CLUES_PER_CATEGORY = 5
+FINALS = 8
+
+
+class RecordingClient:
+    """Collects what migrate.py upserts in place of the Supabase client."""
+
+    def __init__(self):
+        self.rows = {"categories": {}, "clues": {}}
+        self.name = None
+
+    def table(self, name):
+        self.name = name
+        return self
+
+    def upsert(self, rows):
+        self.rows[self.name].update((row["id"], dict(row)) for row in rows)
+        return self
+
+    def execute(self):
+        return None
+
+
+def jarchive_database() -> sqlite3.Connection:
+    """A tiny j-archive database with the tables migrate.py reads."""
+    connection = sqlite3.connect(":memory:")
+    connection.executescript("""
+        create table episodes (id integer primary key, date integer);
+        create table boards (id integer primary key, episode_id integer);
+        create table categories (id integer primary key, name text, board_id integer);
+        create table clues (id integer primary key, category_id integer, value integer, question text, answer text);
+        create table final_clues (id integer primary key, category text, notes text, question text, answer text);
+        insert into episodes values (1, 473385600);
+        insert into boards values (1, 1);
+    """)
+    for category_id in range(1, CATEGORIES + 1):
+        connection.execute("insert into categories values (?, ?, 1)", (category_id, f"Category {category_id}"))
+        for position in range(CLUES_PER_CATEGORY):
+            clue_id = category_id * 100 + position
+            connection.execute(
+                "insert into clues values (?, ?, ?, ?, ?)",
+                (clue_id, category_id, (position + 1) * 200, f"Question {clue_id}", f"Answer {clue_id}")
+            )
+    for final_id in range(1, FINALS + 1):
+        connection.execute(
+            "insert into final_clues values (?, ?, '', ?, ?)",
+            (final_id, f"Final {final_id}", f"Final question {final_id}", f"Final answer {final_id}")
+        )
+    return connection
+
+
+@pytest.fixture
+def deploy_api(monkeypatch):
+    """deploy/api.py talking to the fake PostgREST server over rows loaded by deploy/migrate.py."""
+    monkeypatch.setenv("SUPABASE_URL", "http://fake-postgrest")
+    monkeypatch.setenv("SUPABASE_SERVICE_KEY", "test")
+    migrate = import_from(DEPLOY, "migrate")
+    client = RecordingClient()
+    monkeypatch.setattr(migrate, "supabase", client)
+    monkeypatch.setattr(migrate.time, "sleep", lambda seconds: None)
+    cursor = jarchive_database().cursor()
+    migrate.process_remaining_categories(cursor, start_id=0)
+    migrate.process_clues(cursor)
+    migrate.process_final_clues(cursor)
+
+    fake_postgrest = import_from(BENCHMARKS, "fake_postgrest")
+    database = fake_postgrest.Database(list(client.rows["categories"].values()), list(client.rows["clues"].values()))
+    api = import_from(DEPLOY, "api")
+    api.upstream._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=fake_postgrest.create_app(database)), base_url=api.upstream.base_url
+    )
+    return api, database
+
+
+def test_final_round_finds_migrated_finals(deploy_api):
+    api, _ = deploy_api
+    columns = asyncio.run(api.build_final_columns(6))
+    assert len(columns) == 6
+    assert all(column["title"].startswith("Final ") for column in columns)
+
+
+def test_board_skips_reported_clues(deploy_api):
+    api, database = deploy_api
+    # Every category but the first two loses one clue to reports
+    reported = {category_id * 100 for category_id in range(3, CATEGORIES + 1)}
+    for clue_id in reported:
+        database.by_id["clues"][clue_id]["invalid_count"] = 1
+    api.category_pool.eligible_ids = list(range(1, CATEGORIES + 1))
+
+    columns = asyncio.run(api.build_board_columns(2, CLUES_PER_CATEGORY, "jeopardy"))
+    assert {column["id"] for column in columns} == {1, 2}
+    assert not reported & {clue["id"] for column in columns for clue in column["clues"]}
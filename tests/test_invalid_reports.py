@@ -0,0 +1,76 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_module(path: Path):
+    spec = importlib.util.spec_from_file_location(f"invalid_reports_{path.parent.name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# deploy/ ships its own copy of the buffer; both must behave the same
+@pytest.fixture(params=[ROOT / "invalid_reports.py", ROOT / "deploy" / "invalid_reports.py"], ids=["root", "deploy"])
+def buffer_class(request):
+    return load_module(request.param).InvalidReportBuffer
+
+
+def test_stop_keeps_a_batch_still_being_written(buffer_class):
+    written = []
+    write_started = None
+
+    async def slow_write(batch):
+        write_started.set()
+        await asyncio.sleep(0.2)
+        written.append(batch)
+
+    async def scenario():
+        nonlocal write_started
+        write_started = asyncio.Event()
+        buffer = buffer_class(slow_write, max_pending=3, flush_seconds=60)
+        await buffer.start()
+        for _ in range(3):
+            buffer.add(7)
+        await write_started.wait()
+        # Arrives while {7: 3} is in flight, then shutdown begins
+        buffer.add(8)
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    totals = {}
+    for batch in written:
+        for clue_id, count in batch.items():
+            totals[clue_id] = totals.get(clue_id, 0) + count
+    assert totals == {7: 3, 8: 1}
+
+
+def test_cancelled_write_puts_its_batch_back(buffer_class):
+    written = []
+    calls = 0
+
+    async def write(batch):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(10)
+        written.append(batch)
+
+    async def scenario():
+        buffer = buffer_class(write, max_pending=100, flush_seconds=60)
+        buffer.add(5)
+        buffer.add(5)
+        task = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert buffer.pending_reports == 2
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    assert written == [{5: 2}]
@@ -0,0 +1,230 @@
+import csv
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from clue_cleaning import clean_clue_text
+from clue_table import ClueTable, ClueTableBuilder
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Categories with fewer clues than this are dropped by every converter
+MIN_CATEGORY_CLUES = 5
+
+# Value given to clues whose clue_value isn't a number
+DEFAULT_VALUE = 200
+
+
+class TsvClue(NamedTuple):
+    id: int
+    category_id: int
+    answer: str
+    question: str
+    clean_question: Optional[str]
+    clean_answer: Optional[str]
+    value: int
+    airdate: datetime
+    game_id: int
+
+
+class IngestResult(NamedTuple):
+    categories: int
+    clues: int
+    kept: Set[int]          # ids of the categories with at least MIN_CATEGORY_CLUES clues
+    next_category_id: int
+    next_clue_id: int
+
+
+class TsvSink:
+    """Receives records as the TSV is read; override the callbacks you need.
+
+    `category` is called the first time a title is seen, before any of its
+    clues. `finish` gets the categories that made the cut, so sinks that
+    already wrote the small ones can take them out again.
+    """
+
+    def category(self, category_id: int, title: str):
+        pass
+
+    def clue(self, clue: TsvClue):
+        pass
+
+    def finish(self, kept: Set[int]):
+        pass
+
+
+def ingest_tsv(
+    path: Union[str, Path],
+    sinks: Iterable[TsvSink],
+    clean: bool = True,
+    first_category_id: int = 1,
+    first_clue_id: int = 1
+) -> IngestResult:
+    """Read a j-archive TSV once, streaming categories and clues to every sink.
+
+    Category ids are handed out on first sight of a title and clue ids in
+    row order (game ids follow clue ids, as they always have). Each
+    distinct air_date is parsed once. With `clean`, the cleaned question
+    and answer are computed as well.
+    """
+    sinks = list(sinks)
+    category_ids: Dict[str, int] = {}
+    clue_counts: Dict[int, int] = {}
+    airdates: Dict[str, datetime] = {}
+    clue_id = first_clue_id
+
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file, delimiter="\t")
+        header = next(reader, None)
+        if header is None:
+            return IngestResult(0, 0, set(), first_category_id, first_clue_id)
+        columns = {name: position for position, name in enumerate(header)}
+        category_column, answer_column = columns["category"], columns["answer"]
+        # The question text lives in the comments column
+        question_column = columns["comments"]
+        value_column, airdate_column = columns["clue_value"], columns["air_date"]
+
+        for row in reader:
+            title = row[category_column].strip()
+            category_id = category_ids.get(title)
+            if category_id is None:
+                category_id = category_ids[title] = first_category_id + len(category_ids)
+                clue_counts[category_id] = 0
+                for sink in sinks:
+                    sink.category(category_id, title)
+
+            air_date = row[airdate_column]
+            airdate = airdates.get(air_date)
+            if airdate is None:
+                airdate = airdates[air_date] = datetime.strptime(air_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+            answer = row[answer_column].strip()
+            question = row[question_column].strip()
+            clean_question, clean_answer = clean_clue_text(question, answer) if clean else (None, None)
+            value = row[value_column]
+            clue = TsvClue(
+                clue_id, category_id, answer, question, clean_question, clean_answer,
+                int(value) if value.isdigit() else DEFAULT_VALUE, airdate, clue_id
+            )
+            for sink in sinks:
+                sink.clue(clue)
+            clue_counts[category_id] += 1
+            clue_id += 1
+
+    kept = {category_id for category_id, count in clue_counts.items() if count >= MIN_CATEGORY_CLUES}
+    for sink in sinks:
+        sink.finish(kept)
+    return IngestResult(len(category_ids), clue_id - first_clue_id, kept, first_category_id + len(category_ids), clue_id)
+
+
+class RecordingSink(TsvSink):
+    """Keeps every record, so a file parsed in a worker process can be replayed into sinks in the parent."""
+
+    def __init__(self):
+        self.categories: List[Tuple[int, str]] = []
+        self.clues: List[TsvClue] = []
+        self.kept: Set[int] = set()
+
+    def category(self, category_id: int, title: str):
+        self.categories.append((category_id, title))
+
+    def clue(self, clue: TsvClue):
+        self.clues.append(clue)
+
+    def finish(self, kept: Set[int]):
+        self.kept = kept
+
+    def replay(self, sinks: Iterable[TsvSink]):
+        """Feed the records to `sinks` as if they were reading the file."""
+        sinks = list(sinks)
+        for category_id, title in self.categories:
+            for sink in sinks:
+                sink.category(category_id, title)
+        for clue in self.clues:
+            for sink in sinks:
+                sink.clue(clue)
+        for sink in sinks:
+            sink.finish(self.kept)
+
+
+class CategoryTreeSink(TsvSink):
+    """Builds categories with nested clues, the shape of json_seasons/*.json."""
+
+    def __init__(self, created_at: str):
+        self.created_at = created_at
+        self.categories: Dict[int, Dict[str, Any]] = {}
+
+    def category(self, category_id: int, title: str):
+        self.categories[category_id] = {
+            "id": category_id,
+            "title": title,
+            "created_at": self.created_at,
+            "updated_at": self.created_at,
+            "clues_count": 0,
+            "clues": []
+        }
+
+    def clue(self, clue: TsvClue):
+        self.categories[clue.category_id]["clues"].append({
+            "id": clue.id,
+            "answer": clue.answer,
+            "question": clue.question,
+            "clean_question": clue.clean_question,
+            "clean_answer": clue.clean_answer,
+            "value": clue.value,
+            "airdate": clue.airdate.isoformat(),
+            "created_at": self.created_at,
+            "updated_at": self.created_at,
+            "category_id": clue.category_id,
+            "game_id": clue.game_id,
+            "invalid_count": None
+        })
+
+    def finish(self, kept: Set[int]):
+        self.categories = {category_id: category for category_id, category in self.categories.items() if category_id in kept}
+        for category in self.categories.values():
+            category["clues_count"] = len(category["clues"])
+
+
+class ClueTableSink(TsvSink):
+    """Feeds a ClueTableBuilder directly, for writing snapshot files.
+
+    The same sink can take several files in turn (with increasing first ids);
+    build() then returns one table holding every kept category.
+    """
+
+    def __init__(self, created_at: str):
+        self.created_at = created_at
+        self.builder = ClueTableBuilder()
+        self.titles: Dict[int, str] = {}
+        self.clues: Dict[int, List[TsvClue]] = {}
+
+    def category(self, category_id: int, title: str):
+        self.titles[category_id] = title
+        self.clues[category_id] = []
+
+    def clue(self, clue: TsvClue):
+        # Held until finish() knows whether the category is kept
+        self.clues[clue.category_id].append(clue)
+
+    def finish(self, kept: Set[int]):
+        created_at = self.created_at
+        for category_id, title in self.titles.items():
+            clues = self.clues[category_id]
+            if category_id in kept:
+                self.builder.categories.append({
+                    "id": category_id, "title": title, "created_at": created_at, "updated_at": created_at,
+                    "clues_count": len(clues), "valid_clues_count": len(clues)
+                })
+                for clue in clues:
+                    self.builder.clues.append(dict(
+                        clue._asdict(), airdate=clue.airdate.isoformat(),
+                        created_at=created_at, updated_at=created_at, invalid_count=None
+                    ))
+        self.titles, self.clues = {}, {}
+
+    def build(self) -> ClueTable:
+        return self.builder.build()
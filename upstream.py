@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from metrics import record_upstream
+
+if TYPE_CHECKING:
+    import httpx
+
+# PostgREST filters are (column, "operator.value") pairs, e.g. ("value", "eq.200")
+Filters = Sequence[Tuple[str, str]]
+
+
+class UpstreamError(Exception):
+    """Raised when PostgREST answers with an error status."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Upstream returned {status_code}: {message}")
+        self.status_code = status_code
+
+
+class Upstream:
+    """Async PostgREST client sharing one keep-alive connection pool.
+
+    Requests beyond `max_concurrency` wait on a semaphore instead of opening
+    more connections, so a burst of traffic cannot exhaust the pool.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        max_connections: int = 20,
+        max_keepalive: int = 10,
+        max_concurrency: int = 20,
+        timeout: float = 10.0
+    ):
+        self.base_url = f"{(url or '').rstrip('/')}/rest/v1"
+        self.headers = {"apikey": key or "", "Authorization": f"Bearer {key or ''}"}
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    @classmethod
+    def from_env(cls) -> "Upstream":
+        return cls(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_SERVICE_KEY"),
+            max_connections=int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20")),
+            max_keepalive=int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "10")),
+            max_concurrency=int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "20")),
+            timeout=float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+        )
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        # Created on first use so importing the app never opens connections, or even imports httpx
+        # (a sizeable share of a cold start that a snapshot-served request may never need)
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive),
+                timeout=self.timeout
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[List[Tuple[str, str]]] = None,
+        json: Any = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Any:
+        client = self.client
+        import httpx  # loaded by self.client, so this is only a lookup
+        start = time.perf_counter()
+        try:
+            async with self._semaphore:
+                response = await client.request(method, path, params=params, json=json, headers=headers)
+        except httpx.HTTPError:
+            record_upstream(method, path, time.perf_counter() - start, 0, 0)
+            raise
+        record_upstream(method, path, time.perf_counter() - start, len(response.content), response.status_code)
+        if response.status_code >= 400:
+            raise UpstreamError(response.status_code, response.text)
+        return response.json() if response.content else None
+
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Filters = (),
+        order: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """GET rows from a table, e.g. select("clues", "*, categories(*)", [("value", "eq.200")])."""
+        params = [("select", columns), *filters]
+        if order:
+            params.append(("order", order))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        if offset:
+            params.append(("offset", str(offset)))
+        return await self.request("GET", f"/{table}", params=params)
+
+    async def update(self, table: str, values: Dict[str, Any], filters: Filters) -> List[Dict[str, Any]]:
+        """PATCH matching rows and return them as updated."""
+        return await self.request(
+            "PATCH",
+            f"/{table}",
+            params=list(filters),
+            json=values,
+            headers={"Prefer": "return=representation"}
+        )
+
+    async def rpc(self, function: str, args: Dict[str, Any]) -> Any:
+        """Call a Postgres function exposed by PostgREST."""
+        return await self.request("POST", f"/rpc/{function}", json=args)